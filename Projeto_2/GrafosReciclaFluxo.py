@@ -5,113 +5,617 @@
 # Carlos Eduardo Rosendo Basseto -  10409941
 # Luiz Henrique Ribeiro Pulga -     10409246
 
-import re
+import os
 import sys
+import csv
+import json
+import argparse
+import contextlib
+import io
+import functools
+import math
+import mmap
+import time
 import heapq
+import random
+import struct
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 
 GRAFO_FILENAME = "grafo.txt"
+JOURNAL_COMPACT_EVERY = 1000
+SNAPSHOT_HEADER = "<8sqqqq"
+
+def _snapshot_magic():
+    return b"RFGRAFO" + (b"L" if sys.byteorder == "little" else b"B")
+
+def _parse_vertex_line(line):
+    # Equivale a ^(\d+)\s+"([^"]*)"\s+"([^"]*)"$ sem passar por regex.
+    partes = line.split(None, 1)
+    if len(partes) != 2 or not partes[0].isdigit():
+        return None
+    campos = partes[1].split('"')
+    if len(campos) != 5 or campos[0] or campos[4] or not campos[2].isspace():
+        return None
+    return int(partes[0]), campos[1], campos[3]
+
+def parse_peso(texto):
+    # Converte o peso de uma aresta para número uma única vez, na carga ou na
+    # inserção; os algoritmos passam a fazer só comparações numéricas.
+    if isinstance(texto, (int, float)):
+        valor = texto
+    else:
+        try:
+            valor = int(texto)
+        except ValueError:
+            valor = float(texto)
+    if not math.isfinite(valor) or valor < 0:
+        raise ValueError(f"peso inválido: {texto}")
+    return valor
+
+class Profiler:
+    # Instrumentação opcional. Desligada, não há custo nas chamadas: ativar()
+    # substitui os métodos de Graph e as funções do módulo por versões
+    # cronometradas e desativar() restaura as originais. Os algoritmos somam seus
+    # contadores (heap, relaxações, reconstruções de índice) só quando ativo.
+    # Referências importadas com "from GrafosReciclaFluxo import ..." antes de
+    # ativar() continuam apontando para as funções sem instrumentação.
+    METODOS = ("load_from_file", "write_to_file", "replay_journal", "compact",
+               "save_snapshot", "load_snapshot", "insert_vertex", "insert_vertices",
+               "insert_edge", "remove_vertex", "remove_vertices", "remove_edge",
+               "to_csr", "is_connected", "check_directed_connectivity")
+    FUNCOES = ("dijkstra", "dijkstra_paths", "distance_matrix", "floyd_warshall",
+               "minimum_spanning_forest", "prim_mst", "colorir", "colorir_vertices",
+               "strongly_connected_components", "condensation", "classify_connectivity",
+               "astar", "bidirectional_dijkstra", "max_flow")
+
+    def __init__(self):
+        self.ativo = False
+        self.trace = False
+        self._originais = {}
+        self.limpar()
+
+    def limpar(self):
+        self.chamadas = {}
+        self.contadores = {}
+        self.eventos = []
+        self._inicio = time.perf_counter()
+
+    def ativar(self, trace=False):
+        if self.ativo:
+            return
+        self.ativo = True
+        self.trace = trace
+        modulo = globals()
+        for nome in self.FUNCOES:
+            self._originais[nome] = modulo[nome]
+            modulo[nome] = self._envolver(nome, modulo[nome])
+        for nome in self.METODOS:
+            original = Graph.__dict__[nome]
+            self._originais["Graph." + nome] = original
+            if isinstance(original, classmethod):
+                setattr(Graph, nome, classmethod(self._envolver("Graph." + nome, original.__func__)))
+            else:
+                setattr(Graph, nome, self._envolver("Graph." + nome, original))
+
+    def desativar(self):
+        if not self.ativo:
+            return
+        modulo = globals()
+        for nome, original in self._originais.items():
+            if nome.startswith("Graph."):
+                setattr(Graph, nome[len("Graph."):], original)
+            else:
+                modulo[nome] = original
+        self._originais.clear()
+        self.ativo = False
+
+    @contextlib.contextmanager
+    def sessao(self, trace=False):
+        self.ativar(trace)
+        try:
+            yield self
+        finally:
+            self.desativar()
+
+    def _envolver(self, nome, func):
+        perfil = self
+        @functools.wraps(func)
+        def cronometrada(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                perfil._registrar_chamada(nome, inicio, time.perf_counter())
+        return cronometrada
+
+    def _registrar_chamada(self, nome, inicio, fim):
+        dados = self.chamadas.get(nome)
+        if dados is None:
+            dados = self.chamadas[nome] = [0, 0.0, 0.0]
+        dados[0] += 1
+        dados[1] += fim - inicio
+        dados[2] = max(dados[2], fim - inicio)
+        if self.trace:
+            self.eventos.append((nome, inicio, fim))
+
+    def contar(self, nome, n=1):
+        self.contadores[nome] = self.contadores.get(nome, 0) + n
+
+    def relatorio(self):
+        return {
+            "chamadas": {nome: {"quantidade": q, "tempo_total": t, "tempo_medio": t / q, "tempo_max": m}
+                         for nome, (q, t, m) in sorted(self.chamadas.items())},
+            "contadores": dict(sorted(self.contadores.items())),
+        }
+
+    def imprimir_relatorio(self):
+        print(f"{'operação':<36}{'chamadas':>10}{'total (s)':>12}{'médio (s)':>12}")
+        for nome, d in self.relatorio()["chamadas"].items():
+            print(f"{nome:<36}{d['quantidade']:>10}{d['tempo_total']:>12.4f}{d['tempo_medio']:>12.6f}")
+        for nome, valor in sorted(self.contadores.items()):
+            print(f"  {nome}: {valor}")
+
+    def exportar_trace(self, filename):
+        # Formato Trace Event (chrome://tracing, Perfetto): um evento completo
+        # ("ph": "X") por chamada, com tempos em microssegundos.
+        eventos = [{"name": nome, "ph": "X", "pid": os.getpid(), "tid": 0,
+                    "ts": (inicio - self._inicio) * 1e6, "dur": (fim - inicio) * 1e6}
+                   for nome, inicio, fim in self.eventos]
+        eventos.append({"name": "contadores", "ph": "C", "pid": os.getpid(), "tid": 0,
+                        "ts": (time.perf_counter() - self._inicio) * 1e6, "args": self.contadores})
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": eventos, "displayTimeUnit": "ms"}, f)
+
+PROFILER = Profiler()
 
 class Graph:
-    def __init__(self, graph_type, vertices, edges):
+    def __init__(self, graph_type, vertices, edges, peso_texto=None):
         self.graph_type = graph_type
         self.vertices = vertices
         self.edges = edges
+        # Grafia original dos pesos que não voltam iguais de str(numero), como
+        # "4.50" ou "1e3", para que write_to_file reproduza o arquivo lido.
+        self.peso_texto = peso_texto if peso_texto is not None else {}
+        # Adjacência persistente {u: {v: peso}}, mantida pelas operações de edição.
+        # Em grafos não direcionados radj é o próprio adj; nos direcionados guarda
+        # os arcos de entrada, para que remover um vértice custe O(grau).
+        self.adj = {v: {} for v in vertices}
+        self.radj = {v: {} for v in vertices} if self.is_directed() else self.adj
+        self._csr = None
+        # Índice union-find das componentes (fracas, se direcionado). Inserções o
+        # atualizam em O(α(n)); remoções o invalidam e ele é refeito na consulta.
+        self._componentes = None
+        # Próximo id livre, para que inserir vértices não custe um max() sobre V.
+        self._next_id = max(vertices, default=0) + 1
+        # Observadores de edição, chamados como fn(evento, u, v, antigo, novo) com
+        # evento "aresta" (inserção ou novo peso), "remove_aresta", "insere_vertice"
+        # ou "remove_vertice", e "gravado" (u = arquivo) depois de write_to_file.
+        # Caches e estruturas derivadas se registram aqui.
+        self._observadores = []
+        # Diário de edições (write-ahead): aberto por open_journal, recebe uma
+        # linha por edição bem-sucedida e é zerado por compact.
+        self.journal = None
+        self.journal_path = None
+        self.journal_sync = False
+        self.compact_every = None
+        self._journal_entries = 0
+        for (u, v), peso in edges.items():
+            self._link(u, v, peso)
+
+    def is_directed(self):
+        return self.graph_type not in [0, 1, 2, 3]
+
+    def edge_key(self, u, v):
+        return (u, v) if self.is_directed() else (min(u, v), max(u, v))
+
+    def _link(self, u, v, peso):
+        self.adj[u][v] = peso
+        self.radj[v][u] = peso
+        self._csr = None
+        if self._componentes is not None:
+            self._componentes.union(u, v)
+
+    def _unlink(self, u, v):
+        self.adj[u].pop(v, None)
+        self.radj[v].pop(u, None)
+        self._csr = None
+        self._componentes = None
 
     @classmethod
     def load_from_file(cls, filename):
+        # Leitura em fluxo, linha a linha, sem materializar o arquivo numa lista.
+        # Em grafos não direcionados a segunda cópia de cada aresta é descartada
+        # antes de converter o peso.
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                lines = [line.strip() for line in f if line.strip()]
+            f = open(filename, 'r', encoding='utf-8')
         except FileNotFoundError:
             print(f"Arquivo {filename} não encontrado.")
             return None
+        with f:
+            lines = filter(None, map(str.strip, f))
+            try:
+                graph = cls._parse_lines(lines)
+            except StopIteration:
+                print(f"Arquivo {filename} incompleto.")
+                return None
+        if graph is not None:
+            graph.replay_journal(filename + ".journal")
+        return graph
+
+    @classmethod
+    def _parse_lines(cls, lines):
         try:
-            graph_type = int(lines[0])
-            n = int(lines[1])
+            graph_type = int(next(lines))
+            n = int(next(lines))
         except ValueError:
             print("Erro na leitura do tipo ou número de vértices.")
             return None
         vertices = {}
-        vertex_line_pattern = re.compile(r'^(\d+)\s+"([^"]*)"\s+"([^"]*)"$')
-        for i in range(2, 2 + n):
-            match = vertex_line_pattern.match(lines[i])
-            if match:
-                vid = int(match.group(1))
-                vertices[vid] = {"label": match.group(2), "peso": match.group(3)}
-            else:
-                print(f"Erro ao ler a linha de vértice: {lines[i]}")
+        for _ in range(n):
+            line = next(lines)
+            vertice = _parse_vertex_line(line)
+            if vertice is None:
+                print(f"Erro ao ler a linha de vértice: {line}")
                 return None
+            vid, label, peso = vertice
+            vertices[vid] = {"label": label, "peso": peso}
         try:
-            m = int(lines[2 + n])
+            m = int(next(lines))
         except ValueError:
             print("Erro na leitura do número de arestas.")
             return None
+        undirected = graph_type in [0, 1, 2, 3]
         edges = {}
-        for i in range(3 + n, 3 + n + m):
-            parts = lines[i].split()
+        peso_texto = {}
+        for _ in range(m):
+            line = next(lines)
+            parts = line.split()
             if len(parts) < 3:
-                print(f"Erro ao ler a linha de aresta: {lines[i]}")
+                print(f"Erro ao ler a linha de aresta: {line}")
                 return None
             try:
                 u, v = int(parts[0]), int(parts[1])
-                peso = parts[2]
-                key = (min(u, v), max(u, v)) if graph_type in [0, 1, 2, 3] else (u, v)
+                key = (min(u, v), max(u, v)) if undirected else (u, v)
+                if undirected and key in edges:
+                    continue
+                if u not in vertices or v not in vertices:
+                    print(f"Aresta com vértice inexistente: {line}")
+                    return None
+                peso = parse_peso(parts[2])
                 edges[key] = peso
+                if str(peso) != parts[2]:
+                    peso_texto[key] = parts[2]
             except ValueError:
-                print(f"Erro ao converter dados da aresta: {lines[i]}")
+                print(f"Erro ao converter dados da aresta: {line}")
                 return None
-        return cls(graph_type, vertices, edges)
+        return cls(graph_type, vertices, edges, peso_texto)
+
+    def apply_edit_line(self, line):
+        # Aplica uma linha de edição. Formato, um comando por linha:
+        #   +v [id] "rótulo" "peso"   +e u v peso   -v id   -e u v
+        # Linhas vazias ou iniciadas por # são ignoradas. Devolve False se a linha
+        # não puder ser lida ou se a edição for recusada (vértice ou aresta
+        # inexistente, peso inválido).
+        line = line.strip()
+        if not line or line.startswith("#"):
+            return True
+        cmd, _, resto = line.partition(" ")
+        try:
+            if cmd == "+v":
+                explicito = resto[:1].isdigit()
+                vertice = _parse_vertex_line(resto if explicito else "0 " + resto)
+                if vertice is None:
+                    raise ValueError(line)
+                vid, label, peso = vertice
+                ok = self.insert_vertex(label, peso, vid if explicito else None) is not None
+            elif cmd == "+e":
+                u, v, peso = resto.split()
+                ok = self.insert_edge(int(u), int(v), peso)
+            elif cmd == "-v":
+                ok = self.remove_vertex(int(resto))
+            elif cmd == "-e":
+                u, v = resto.split()
+                ok = self.remove_edge(int(u), int(v))
+            else:
+                raise ValueError(line)
+        except ValueError:
+            print(f"Linha de edição inválida: {line}")
+            return False
+        if not ok:
+            print(f"Edição recusada: {line}")
+        return ok
+
+    def save_snapshot(self, filename):
+        # Formato binário: cabeçalho, vetores CSR nativos (ids, offsets, targets,
+        # weights) e, no fim, rótulos e grafias de peso em JSON. Gravado num
+        # temporário e renomeado, para nunca deixar um arquivo pela metade.
+        csr = self.to_csr()
+        extras = {
+            "vertices": [[self.vertices[vid]["label"], self.vertices[vid]["peso"]] for vid in csr.ids],
+            "peso_texto": [[u, v, t] for (u, v), t in self.peso_texto.items()],
+        }
+        # Pesos float inteiros (ex.: "2.0") voltariam como int; a grafia é preservada.
+        for (u, v), peso in self.edges.items():
+            if isinstance(peso, float) and peso.is_integer() and (u, v) not in self.peso_texto:
+                extras["peso_texto"].append([u, v, str(peso)])
+        blob = json.dumps(extras, ensure_ascii=False).encode('utf-8')
+        header = struct.pack(SNAPSHOT_HEADER, _snapshot_magic(), self.graph_type,
+                             len(csr.ids), len(csr.targets), len(blob))
+        temp = filename + ".tmp"
+        with open(temp, 'wb') as f:
+            f.write(header)
+            for buf in (csr.ids, csr.offsets, csr.targets, csr.weights):
+                f.write(buf)
+            f.write(blob)
+        os.replace(temp, filename)
+
+    @classmethod
+    def load_snapshot(cls, filename):
+        csr, extras = CSRGraph._read_snapshot(filename)
+        vertices = {vid: {"label": label, "peso": peso}
+                    for vid, (label, peso) in zip(csr.ids, extras["vertices"])}
+        edges = {}
+        for u, v, peso in csr.iter_edges():
+            edges[(u, v)] = int(peso) if peso.is_integer() else peso
+        peso_texto = {}
+        for u, v, texto in extras["peso_texto"]:
+            peso_texto[(u, v)] = texto
+            if isinstance(edges[(u, v)], int) and texto != str(edges[(u, v)]):
+                edges[(u, v)] = parse_peso(texto)
+        return cls(csr.graph_type, vertices, edges, peso_texto)
 
     def write_to_file(self, filename):
-        lines = [str(self.graph_type), str(len(self.vertices))]
-        for vid in sorted(self.vertices):
-            v = self.vertices[vid]
-            lines.append(f'{vid} "{v["label"]}" "{v["peso"]}"')
-        edge_lines = []
-        if self.graph_type in [0, 1, 2, 3]:
-            for (u, v), peso in self.edges.items():
-                edge_lines.extend([f"{u} {v} {peso}", f"{v} {u} {peso}"])
-        else:
-            for (u, v), peso in self.edges.items():
-                edge_lines.append(f"{u} {v} {peso}")
-        lines.append(str(len(edge_lines)))
-        lines.extend(edge_lines)
+        if not self._gravar(filename):
+            return False
+        if self._observadores:
+            self._notificar("gravado", filename)
+        return True
+
+    def _gravar(self, filename):
+        # Gravado num temporário e renomeado: o arquivo antigo só é substituído
+        # quando o novo está completo.
+        temp = filename + ".tmp"
+        texto = self.peso_texto
+        undirected = self.graph_type in [0, 1, 2, 3]
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write("\n".join(lines))
-            print("Arquivo atualizado com sucesso!")
+            with open(temp, 'w', encoding='utf-8') as f:
+                f.write(f"{self.graph_type}\n{len(self.vertices)}")
+                for vid in sorted(self.vertices):
+                    v = self.vertices[vid]
+                    f.write(f'\n{vid} "{v["label"]}" "{v["peso"]}"')
+                f.write(f"\n{2 * len(self.edges) if undirected else len(self.edges)}")
+                for (u, v), peso in self.edges.items():
+                    peso = texto.get((u, v), peso)
+                    f.write(f"\n{u} {v} {peso}")
+                    if undirected:
+                        f.write(f"\n{v} {u} {peso}")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, filename)
         except Exception as e:
             print("Erro ao escrever no arquivo:", e)
+            return False
+        print("Arquivo atualizado com sucesso!")
+        return True
+
+    def open_journal(self, filename, compact_every=None, sync=False):
+        # As edições passam a ser anexadas a filename + ".journal" (O(1) de E/S por
+        # edição); compact grava filename por inteiro e zera o diário. Com
+        # compact_every a compactação é automática a cada tantas edições.
+        self.close_journal()
+        self.journal_path = filename
+        self.journal = open(filename + ".journal", 'a', encoding='utf-8')
+        self.journal_sync = sync
+        self.compact_every = compact_every
+        self._journal_entries = 0
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def replay_journal(self, journal_file):
+        # As linhas do diário usam ids explícitos e só atribuem ou removem chaves,
+        # então reaplicá-las sobre um arquivo já compactado não altera o grafo.
+        # Só linhas terminadas em "\n" são aplicadas: uma última linha sem ele foi
+        # cortada por uma queda no meio da escrita (um "+e 1 60 40" pode ter virado
+        # "+e 1 60 4") e é removida do arquivo, para que as próximas edições não
+        # sejam anexadas a ela.
+        try:
+            f = open(journal_file, 'rb')
+        except FileNotFoundError:
+            return 0
+        journal, self.journal = self.journal, None
+        aplicadas = 0
+        recusadas = []
+        fim_valido = 0
+        cortada = None
+        with f:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        cortada = raw
+                        break
+                    fim_valido += len(raw)
+                    line = raw.decode('utf-8', errors='replace')
+                    if not line.strip():
+                        continue
+                    if self.apply_edit_line(line):
+                        aplicadas += 1
+                    else:
+                        recusadas.append(line.strip())
+        self.journal = journal
+        if cortada is not None:
+            with open(journal_file, 'r+b') as f:
+                f.truncate(fim_valido)
+            print(f"Linha incompleta no fim do diário {journal_file} descartada: "
+                  f"{cortada.decode('utf-8', errors='replace')!r}")
+        for line in recusadas:
+            print(f"Linha do diário não aplicada: {line}")
+        if aplicadas:
+            print(f"{aplicadas} edições reaplicadas do diário {journal_file}.")
+        return aplicadas
+
+    def compact(self, filename=None):
+        # Os observadores só são avisados depois que o diário foi zerado.
+        filename = filename or self.journal_path
+        if not self._gravar(filename):
+            return False
+        if self.journal is not None and filename == self.journal_path:
+            self.journal.seek(0)
+            self.journal.truncate()
+            self._journal_entries = 0
+        elif os.path.exists(filename + ".journal"):
+            os.remove(filename + ".journal")
+        if self._observadores:
+            self._notificar("gravado", filename)
+        return True
+
+    def add_listener(self, fn):
+        self._observadores.append(fn)
+
+    def remove_listener(self, fn):
+        if fn in self._observadores:
+            self._observadores.remove(fn)
 
-    def insert_vertex(self, label, peso):
-        new_id = max(self.vertices.keys(), default=0) + 1
+    def _notificar(self, evento, u, v=None, antigo=None, novo=None):
+        for fn in list(self._observadores):
+            fn(evento, u, v, antigo, novo)
+
+    def _registrar(self, linha, *evento):
+        # Anexa a linha ao diário e avisa os observadores do evento, se houver. A
+        # compactação automática vem por último, para que eles já conheçam a
+        # edição quando receberem "gravado".
+        if self.journal is not None:
+            self.journal.write(linha + "\n")
+            self.journal.flush()
+            if self.journal_sync:
+                os.fsync(self.journal.fileno())
+            self._journal_entries += 1
+        if evento and self._observadores:
+            self._notificar(*evento)
+        if (self.journal is not None and self.compact_every
+                and self._journal_entries >= self.compact_every):
+            self.compact()
+
+    def _add_vertex(self, label, peso, vid=None):
+        if '"' in label or '"' in peso:
+            print("Rótulo e peso do vértice não podem conter aspas.")
+            return None
+        if vid is not None and vid in self.vertices:
+            self.vertices[vid] = {"label": label, "peso": peso}
+            self._registrar(f'+v {vid} "{label}" "{peso}"')
+            return vid
+        new_id = self._next_id if vid is None else vid
+        if new_id >= self._next_id:
+            self._next_id = new_id + 1
         self.vertices[new_id] = {"label": label, "peso": peso}
-        print(f"Vértice inserido: id={new_id}, label='{label}', peso='{peso}'")
+        self.adj[new_id] = {}
+        if self.is_directed():
+            self.radj[new_id] = {}
+        self._csr = None
+        if self._componentes is not None:
+            self._componentes.add(new_id)
+        self._registrar(f'+v {new_id} "{label}" "{peso}"', "insere_vertice", new_id)
         return new_id
 
+    def insert_vertex(self, label, peso, vid=None):
+        new_id = self._add_vertex(label, peso, vid)
+        if new_id is not None:
+            print(f"Vértice inserido: id={new_id}, label='{label}', peso='{peso}'")
+        return new_id
+
+    def insert_vertices(self, itens):
+        # Inserção em lote de pares (rótulo, peso); devolve os ids na mesma ordem.
+        ids = [self._add_vertex(label, peso) for label, peso in itens]
+        print(f"{sum(vid is not None for vid in ids)} vértices inseridos.")
+        return ids
+
     def insert_edge(self, u, v, peso):
         if u not in self.vertices or v not in self.vertices:
             print("Um ou ambos os vértices não existem.")
-            return
-        key = (min(u, v), max(u, v)) if self.graph_type in [0, 1, 2, 3] else (u, v)
-        self.edges[key] = peso
+            return False
+        try:
+            valor = parse_peso(peso)
+        except ValueError:
+            print(f"Peso inválido: {peso}")
+            return False
+        key = self.edge_key(u, v)
+        antigo = self.edges.get(key)
+        self.edges[key] = valor
+        if isinstance(peso, str) and str(valor) != peso.strip():
+            self.peso_texto[key] = peso.strip()
+        else:
+            self.peso_texto.pop(key, None)
+        self._link(u, v, valor)
+        self._registrar(f"+e {u} {v} {self.peso_texto.get(key, valor)}", "aresta", u, v, antigo, valor)
         print(f"Aresta inserida/atualizada entre {u} e {v} com peso {peso}.")
+        return True
+
+    def _drop_vertex(self, vid):
+        # O(grau): só as arestas incidentes, achadas em adj/radj, são tocadas.
+        del self.vertices[vid]
+        edges, texto = self.edges, self.peso_texto
+        removidas = 0
+        notificar = self._notificar if self._observadores else None
+        # Cada aresta sai de adj/radj antes de ser notificada, para que os
+        # observadores vejam o grafo coerente a cada passo.
+        for w in list(self.adj[vid]):
+            key = self.edge_key(vid, w)
+            peso = edges.pop(key)
+            texto.pop(key, None)
+            self.adj[vid].pop(w)
+            self.radj[w].pop(vid, None)
+            removidas += 1
+            if notificar:
+                notificar("remove_aresta", vid, w, peso)
+        if self.is_directed():
+            for w in list(self.radj[vid]):
+                key = (w, vid)
+                peso = edges.pop(key)
+                texto.pop(key, None)
+                self.radj[vid].pop(w)
+                self.adj[w].pop(vid, None)
+                removidas += 1
+                if notificar:
+                    notificar("remove_aresta", w, vid, peso)
+            del self.radj[vid]
+        del self.adj[vid]
+        self._registrar(f"-v {vid}", "remove_vertice", vid)
+        return removidas
 
     def remove_vertex(self, vid):
         if vid not in self.vertices:
             print("Vértice não encontrado.")
-            return
-        del self.vertices[vid]
-        self.edges = {k: v for k, v in self.edges.items() if vid not in k}
+            return False
+        self._drop_vertex(vid)
+        self._csr = None
+        self._componentes = None
         print(f"Vértice {vid} e suas arestas foram removidos.")
+        return True
+
+    def remove_vertices(self, vids):
+        # Remoção em lote: índices derivados são invalidados uma única vez.
+        existentes = [vid for vid in dict.fromkeys(vids) if vid in self.vertices]
+        arestas = sum(self._drop_vertex(vid) for vid in existentes)
+        self._csr = None
+        self._componentes = None
+        print(f"{len(existentes)} vértices e {arestas} arestas removidos.")
+        return existentes
 
     def remove_edge(self, u, v):
-        key = (min(u, v), max(u, v)) if self.graph_type in [0, 1, 2, 3] else (u, v)
+        key = self.edge_key(u, v)
         if key in self.edges:
-            del self.edges[key]
+            antigo = self.edges.pop(key)
+            self.peso_texto.pop(key, None)
+            self._unlink(u, v)
+            self._registrar(f"-e {u} {v}", "remove_aresta", u, v, antigo)
             print(f"Aresta entre {u} e {v} removida.")
-        else:
-            print("Aresta não encontrada.")
+            return True
+        print("Aresta não encontrada.")
+        return False
 
     def display_graph(self):
         print("Vértices:")
@@ -125,54 +629,718 @@ class Graph:
                 print(f"  {u} --> {v} com peso {peso}")
 
     def get_adjacency_list(self):
-        adj = {v: [] for v in self.vertices}
-        for (u, v) in self.edges:
-            adj[u].append(v)
-            if self.graph_type in [0, 1, 2, 3]:
-                adj[v].append(u)
-        return adj
+        return self.adj
+
+    def neighbors(self, u):
+        return self.adj[u].items()
+
+    def in_neighbors(self, u):
+        return self.radj[u].items()
+
+    def label(self, v):
+        return self.vertices[v]["label"]
+
+    def iter_edges(self):
+        for (u, v), peso in self.edges.items():
+            yield u, v, peso
+
+    def to_csr(self):
+        # A forma compacta é reconstruída só depois de alguma edição.
+        if self._csr is None:
+            self._csr = CSRGraph.from_graph(self)
+        return self._csr
 
     def is_connected(self):
-        if not self.vertices:
-            return True, []
-        visited = set()
-        def dfs(v):
-            visited.add(v)
-            for w in self.get_adjacency_list()[v]:
+        return _componentes_conexas(self)
+
+    def _indice_componentes(self):
+        if self._componentes is None:
+            if PROFILER.ativo:
+                PROFILER.contar("indice_componentes.reconstrucoes")
+            ds = DisjointSet(self.vertices)
+            for u, v in self.edges:
+                ds.union(u, v)
+            self._componentes = ds
+        return self._componentes
+
+    def same_component(self, u, v):
+        if u not in self.vertices or v not in self.vertices:
+            return False
+        ds = self._indice_componentes()
+        return ds.find(u) == ds.find(v)
+
+    def component_count(self):
+        return self._indice_componentes().count
+
+    def check_directed_connectivity(self):
+        categoria, componentes = classify_connectivity(self)
+        descricao = {
+            "C3": "fortemente conexo",
+            "C2": "unilateralmente conexo",
+            "C1": "fracamente conexo",
+            "C0": "desconexo",
+        }
+        print(f"Categoria de conexidade: {categoria} ({descricao[categoria]}).")
+        print(f"Componentes fortemente conexas: {len(componentes)}")
+        reduzido, _ = condensation(self, componentes)
+        print("\nGrafo reduzido:")
+        reduzido.display_graph()
+        return categoria, reduzido
+
+class CSRGraph:
+    # Forma congelada e compacta do grafo (Compressed Sparse Row). Os vizinhos de
+    # ids[i] ficam em targets[offsets[i]:offsets[i + 1]], com os pesos já em float64
+    # no mesmo intervalo de weights. index é o remapeamento id -> posição densa.
+    __slots__ = ("graph_type", "ids", "index", "offsets", "targets", "weights", "labels", "_reverse")
+
+    def __init__(self, graph_type, ids, offsets, targets, weights, labels=None):
+        self.graph_type = graph_type
+        self.ids = ids
+        self.index = {vid: i for i, vid in enumerate(ids)}
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.labels = labels
+        self._reverse = None
+
+    @classmethod
+    def open_snapshot(cls, filename):
+        # Abre um snapshot de save_snapshot mapeado em memória: os vetores CSR são
+        # visões do arquivo, sem cópia nem conversão.
+        return cls._read_snapshot(filename)[0]
+
+    @classmethod
+    def _read_snapshot(cls, filename):
+        with open(filename, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size = struct.calcsize(SNAPSHOT_HEADER)
+        magic, graph_type, n, nnz, blob_len = struct.unpack_from(SNAPSHOT_HEADER, mm)
+        if magic[:7] != _snapshot_magic()[:7]:
+            raise ValueError(f"{filename} não é um snapshot de grafo")
+        view = memoryview(mm)
+        bufs = []
+        pos = size
+        for fmt, count in (('q', n), ('q', n + 1), ('q', nnz), ('d', nnz)):
+            buf = view[pos:pos + 8 * count].cast(fmt)
+            if magic != _snapshot_magic():
+                buf = array(fmt, buf)
+                buf.byteswap()
+            bufs.append(buf)
+            pos += 8 * count
+        extras = json.loads(bytes(view[pos:pos + blob_len]).decode('utf-8'))
+        labels = tuple(label for label, _ in extras["vertices"])
+        ids, offsets, targets, weights = bufs
+        return cls(graph_type, ids, offsets, targets, weights, labels), extras
+
+    @classmethod
+    def from_graph(cls, graph):
+        if PROFILER.ativo:
+            PROFILER.contar("csr.reconstrucoes")
+        ids = array('q', sorted(graph.vertices))
+        offsets = array('q', [0])
+        targets = array('q')
+        weights = array('d')
+        for vid in ids:
+            vizinhos = graph.adj[vid]
+            targets.extend(vizinhos.keys())
+            weights.extend(vizinhos.values())
+            offsets.append(len(targets))
+        labels = tuple(graph.vertices[vid]["label"] for vid in ids)
+        return cls(graph.graph_type, ids, offsets, targets, weights, labels)
+
+    @property
+    def vertices(self):
+        return self.index
+
+    def is_directed(self):
+        return self.graph_type not in [0, 1, 2, 3]
+
+    def neighbors(self, u):
+        i = self.index[u]
+        a, b = self.offsets[i], self.offsets[i + 1]
+        return zip(self.targets[a:b], self.weights[a:b])
+
+    def in_neighbors(self, u):
+        if not self.is_directed():
+            return self.neighbors(u)
+        if self._reverse is None:
+            self._reverse = self._build_reverse()
+        offsets, sources, weights = self._reverse
+        i = self.index[u]
+        a, b = offsets[i], offsets[i + 1]
+        return zip(sources[a:b], weights[a:b])
+
+    def _build_reverse(self):
+        # CSR transposto, por contagem, construído só quando algum algoritmo
+        # precisa dos arcos de entrada.
+        n = len(self.ids)
+        index = self.index
+        offsets = array('q', [0]) * (n + 1)
+        for t in self.targets:
+            offsets[index[t] + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        pos = array('q', offsets[:n])
+        sources = array('q', [0]) * len(self.targets)
+        weights = array('d', [0.0]) * len(self.targets)
+        for i, u in enumerate(self.ids):
+            for j in range(self.offsets[i], self.offsets[i + 1]):
+                k = index[self.targets[j]]
+                sources[pos[k]] = u
+                weights[pos[k]] = self.weights[j]
+                pos[k] += 1
+        return offsets, sources, weights
+
+    def label(self, v):
+        return self.labels[self.index[v]] if self.labels else str(v)
+
+    def iter_edges(self):
+        # Em grafos não direcionados cada aresta aparece nas duas linhas; só a
+        # ocorrência com u <= v é devolvida.
+        directed = self.is_directed()
+        for i, u in enumerate(self.ids):
+            for j in range(self.offsets[i], self.offsets[i + 1]):
+                v = self.targets[j]
+                if directed or u <= v:
+                    yield u, v, self.weights[j]
+
+    def nbytes(self):
+        return sum(buf.itemsize * len(buf) for buf in (self.ids, self.offsets, self.targets, self.weights))
+
+    def is_connected(self):
+        return _componentes_conexas(self)
+
+def _componentes_conexas(graph):
+    # Busca em largura iterativa, sem limite de recursão. Em grafos direcionados
+    # segue arcos nos dois sentidos, isto é, devolve as componentes fracas.
+    if not graph.vertices:
+        return True, []
+    directed = graph.is_directed()
+    visited = set()
+    componentes = []
+    for v in graph.vertices:
+        if v in visited:
+            continue
+        visited.add(v)
+        comp = [v]
+        fila = deque(comp)
+        while fila:
+            x = fila.popleft()
+            for w, _ in graph.neighbors(x):
                 if w not in visited:
-                    dfs(w)
-        componentes = []
-        for v in self.vertices:
-            if v not in visited:
-                comp = set()
-                def dfs_comp(x):
-                    comp.add(x)
-                    visited.add(x)
-                    for w in self.get_adjacency_list()[x]:
-                        if w not in comp:
-                            dfs_comp(w)
-                dfs_comp(v)
+                    visited.add(w)
+                    comp.append(w)
+                    fila.append(w)
+            if directed:
+                for w, _ in graph.in_neighbors(x):
+                    if w not in visited:
+                        visited.add(w)
+                        comp.append(w)
+                        fila.append(w)
+        componentes.append(set(comp))
+    return (len(componentes) == 1), componentes
+
+def strongly_connected_components(graph):
+    # Tarjan iterativo, O(V + E) e sem recursão. As componentes saem em ordem
+    # topológica reversa do grafo reduzido.
+    index = {}
+    low = {}
+    na_pilha = set()
+    pilha = []
+    componentes = []
+    contador = 0
+    for raiz in graph.vertices:
+        if raiz in index:
+            continue
+        index[raiz] = low[raiz] = contador
+        contador += 1
+        pilha.append(raiz)
+        na_pilha.add(raiz)
+        trabalho = [(raiz, iter(graph.neighbors(raiz)))]
+        while trabalho:
+            v, vizinhos = trabalho[-1]
+            avancou = False
+            for w, _ in vizinhos:
+                if w not in index:
+                    index[w] = low[w] = contador
+                    contador += 1
+                    pilha.append(w)
+                    na_pilha.add(w)
+                    trabalho.append((w, iter(graph.neighbors(w))))
+                    avancou = True
+                    break
+                if w in na_pilha and index[w] < low[v]:
+                    low[v] = index[w]
+            if avancou:
+                continue
+            trabalho.pop()
+            if trabalho:
+                u = trabalho[-1][0]
+                if low[v] < low[u]:
+                    low[u] = low[v]
+            if low[v] == index[v]:
+                comp = []
+                while True:
+                    w = pilha.pop()
+                    na_pilha.discard(w)
+                    comp.append(w)
+                    if w == v:
+                        break
                 componentes.append(comp)
-        return (len(componentes) == 1), componentes
+    return componentes
 
-    def check_directed_connectivity(self):
-        print("Funcionalidade para grafos direcionados não foi implementada neste exemplo.")
+def condensation(graph, componentes=None):
+    # Grafo reduzido: um vértice por componente fortemente conexa, numerados de 1
+    # em ordem topológica, com o menor peso entre os arcos de cada par. Devolve
+    # também o mapa vértice original -> vértice reduzido.
+    if componentes is None:
+        componentes = strongly_connected_components(graph)
+    ordem = componentes[::-1]
+    comp_de = {}
+    vertices = {}
+    for i, comp in enumerate(ordem, 1):
+        for v in comp:
+            comp_de[v] = i
+        vertices[i] = {"label": ",".join(str(v) for v in sorted(comp)), "peso": ""}
+    edges = {}
+    for u, v, peso in graph.iter_edges():
+        cu, cv = comp_de[u], comp_de[v]
+        if cu != cv and peso < edges.get((cu, cv), float('inf')):
+            edges[(cu, cv)] = peso
+    return Graph(graph.graph_type, vertices, edges), comp_de
 
-def dijkstra(graph, start):
-    distances = {v: float('inf') for v in graph.vertices}
-    distances[start] = 0
+def classify_connectivity(graph):
+    # C3 fortemente, C2 unilateralmente, C1 fracamente conexo, C0 desconexo.
+    # É unilateral quando a ordem topológica do grafo reduzido é um caminho.
+    componentes = strongly_connected_components(graph)
+    if len(componentes) <= 1:
+        return "C3", componentes
+    if not graph.is_directed() or not _componentes_conexas(graph)[0]:
+        return "C0", componentes
+    reduzido, _ = condensation(graph, componentes)
+    k = len(componentes)
+    if all((i, i + 1) in reduzido.edges for i in range(1, k)):
+        return "C2", componentes
+    return "C1", componentes
+
+def dijkstra_paths(graph, start, targets=None, k=None):
+    # Dijkstra com remoção preguiçosa: entradas antigas do heap são descartadas ao
+    # sair. A busca para assim que todos os alvos (ou os k mais próximos entre eles,
+    # ou os k vértices mais próximos se não houver alvos) forem fechados.
+    # Devolve só os vértices fechados: {v: distância} e {v: predecessor}.
+    restantes = set(targets) if targets is not None else None
+    if restantes is not None:
+        restantes.discard(start)
+        if not restantes:
+            return {start: 0}, {start: None}
+    limite = k if k is not None else float('inf')
+    tentative = {start: 0}
+    pred = {start: None}
+    distances = {}
+    encontrados = 0
+    empilhados = 0
+    examinadas = 0
     heap = [(0, start)]
     while heap:
         dist, u = heapq.heappop(heap)
-        for v in graph.get_adjacency_list()[u]:
-            key = (min(u, v), max(u, v)) if graph.graph_type in [0,1,2,3] else (u, v)
-            weight = float(graph.edges.get(key, float('inf')))
-            if distances[u] + weight < distances[v]:
-                distances[v] = distances[u] + weight
-                heapq.heappush(heap, (distances[v], v))
+        if u in distances:
+            continue
+        distances[u] = dist
+        if u != start and (restantes is None or u in restantes):
+            encontrados += 1
+            if restantes is not None:
+                restantes.discard(u)
+            if encontrados >= limite or (restantes is not None and not restantes):
+                break
+        for v, weight in graph.neighbors(u):
+            examinadas += 1
+            nova = dist + weight
+            if v not in distances and nova < tentative.get(v, float('inf')):
+                tentative[v] = nova
+                pred[v] = u
+                heapq.heappush(heap, (nova, v))
+                empilhados += 1
+    if PROFILER.ativo:
+        PROFILER.contar("dijkstra.heap_push", empilhados)
+        PROFILER.contar("dijkstra.heap_pop", empilhados + 1 - len(heap))
+        PROFILER.contar("dijkstra.vertices_fechados", len(distances))
+        PROFILER.contar("dijkstra.arestas_examinadas", examinadas)
+    return distances, {v: pred[v] for v in distances}
+
+def reconstruct_path(pred, target):
+    if target not in pred:
+        return []
+    path = []
+    while target is not None:
+        path.append(target)
+        target = pred[target]
+    path.reverse()
+    return path
+
+def dijkstra(graph, start):
+    distances = {v: float('inf') for v in graph.vertices}
+    distances.update(dijkstra_paths(graph, start)[0])
     return distances
 
-def encontrar_ponto_mais_proximo(graph):
+# Grafo somente leitura de cada processo do pool, recebido uma vez no initializer.
+_grafo_trabalhador = None
+
+def _iniciar_trabalhador(csr):
+    global _grafo_trabalhador
+    _grafo_trabalhador = csr
+
+def _linha_distancias(tarefa):
+    source, targets = tarefa
+    distances = dijkstra_paths(_grafo_trabalhador, source, targets=targets)[0]
+    return [distances.get(t, float('inf')) for t in targets]
+
+def floyd_warshall(graph, vertices=None):
+    vertices = list(vertices) if vertices is not None else sorted(graph.vertices)
+    pos = {v: i for i, v in enumerate(vertices)}
+    inf = float('inf')
+    n = len(vertices)
+    dist = [[inf] * n for _ in range(n)]
+    for i, u in enumerate(vertices):
+        dist[i][i] = 0
+        for v, weight in graph.neighbors(u):
+            j = pos.get(v)
+            if j is not None and weight < dist[i][j]:
+                dist[i][j] = weight
+    for k in range(n):
+        row_k = dist[k]
+        for row_i in dist:
+            dik = row_i[k]
+            if dik == inf:
+                continue
+            row_i[:] = [a if a <= dik + b else dik + b for a, b in zip(row_i, row_k)]
+    return vertices, dist
+
+def distance_matrix(graph, sources, targets=None, workers=None, method="dijkstra"):
+    # Matriz densa sources x targets. Com method="dijkstra" cada origem é uma busca
+    # independente, distribuída num pool de processos que recebe a forma CSR uma
+    # única vez; method="floyd" usa Floyd–Warshall, melhor em grafos pequenos e densos.
+    sources = list(sources)
+    targets = list(targets) if targets is not None else sorted(graph.vertices)
+    if method == "floyd":
+        vertices, dist = floyd_warshall(graph)
+        pos = {v: i for i, v in enumerate(vertices)}
+        return [[dist[pos[s]][pos[t]] for t in targets] for s in sources]
+    if method != "dijkstra":
+        raise ValueError(f"método desconhecido: {method}")
+    csr = graph.to_csr() if isinstance(graph, Graph) else graph
+    tarefas = [(s, targets) for s in sources]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(sources) < 2:
+        _iniciar_trabalhador(csr)
+        return [_linha_distancias(t) for t in tarefas]
+    chunksize = max(1, len(tarefas) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_trabalhador, initargs=(csr,)) as pool:
+        return list(pool.map(_linha_distancias, tarefas, chunksize=chunksize))
+
+class DistanceCache:
+    # Cache LRU de resultados completos de Dijkstra (distâncias e predecessores) por
+    # origem, limitado a maxsize entradas. Registra-se como observador do grafo e
+    # descarta só as entradas que uma edição pode de fato alterar: aumentar o peso
+    # de uma aresta fora da árvore de caminhos mínimos, por exemplo, mantém a
+    # entrada. Os dicionários devolvidos são compartilhados e não devem ser alterados.
+    def __init__(self, graph, maxsize=128):
+        self.graph = graph
+        self.maxsize = maxsize
+        self.entradas = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        graph.add_listener(self._ao_editar)
+
+    def consulta(self, origem):
+        entrada = self.entradas.get(origem)
+        if entrada is not None:
+            self.hits += 1
+            self.entradas.move_to_end(origem)
+            return entrada
+        self.misses += 1
+        entrada = dijkstra_paths(self.graph, origem)
+        self.entradas[origem] = entrada
+        if len(self.entradas) > self.maxsize:
+            self.entradas.popitem(last=False)
+            self.evictions += 1
+        return entrada
+
+    def estatisticas(self):
+        total = self.hits + self.misses
+        return {"entradas": len(self.entradas), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses,
+                "taxa_acerto": self.hits / total if total else 0.0,
+                "evictions": self.evictions, "invalidations": self.invalidations}
+
+    def limpar(self):
+        self.entradas.clear()
+
+    def fechar(self):
+        self.graph.remove_listener(self._ao_editar)
+        self.entradas.clear()
+
+    def _afetada(self, origem, dist, pred, evento, u, v, antigo, novo):
+        directed = self.graph.is_directed()
+        na_arvore = pred.get(v) == u or (not directed and pred.get(u) == v)
+        if evento == "remove_aresta":
+            return na_arvore
+        if evento == "remove_vertice":
+            return u == origem or u in dist
+        if evento == "aresta":
+            if antigo is not None and novo >= antigo:
+                return na_arvore and novo > antigo
+            inf = float('inf')
+            if dist.get(u, inf) + novo < dist.get(v, inf):
+                return True
+            return not directed and dist.get(v, inf) + novo < dist.get(u, inf)
+        return False
+
+    def _ao_editar(self, evento, u, v, antigo, novo):
+        for origem in [o for o, (dist, pred) in self.entradas.items()
+                       if self._afetada(o, dist, pred, evento, u, v, antigo, novo)]:
+            del self.entradas[origem]
+            self.invalidations += 1
+
+class DynamicSSSP:
+    # Árvore de caminhos mínimos de uma origem mantida sob edições, no estilo de
+    # Ramalingam–Reps. Inserir ou baratear uma aresta propaga a melhora a partir do
+    # vértice beneficiado; remover ou encarecer uma aresta da árvore reinicia só a
+    # subárvore pendurada nela, que é refeita a partir dos vizinhos de entrada não
+    # afetados. ultima_atualizacao guarda quantos vértices a última reparação tocou.
+    def __init__(self, graph, origem):
+        self.graph = graph
+        self.origem = origem
+        self.dist, self.pred = dijkstra_paths(graph, origem)
+        self.filhos = {}
+        for v, p in self.pred.items():
+            if p is not None:
+                self.filhos.setdefault(p, set()).add(v)
+        self.ultima_atualizacao = 0
+        graph.add_listener(self._ao_editar)
+
+    def fechar(self):
+        self.graph.remove_listener(self._ao_editar)
+
+    def distancia(self, v):
+        return self.dist.get(v, float('inf'))
+
+    def caminho(self, v):
+        return reconstruct_path(self.pred, v)
+
+    def _set_pred(self, v, p):
+        antigo = self.pred.get(v)
+        if antigo is not None:
+            self.filhos[antigo].discard(v)
+        self.pred[v] = p
+        if p is not None:
+            self.filhos.setdefault(p, set()).add(v)
+
+    def _ao_editar(self, evento, u, v, antigo, novo):
+        if self.origem not in self.graph.vertices:
+            self.dist.clear()
+            self.pred.clear()
+            self.filhos.clear()
+            return
+        if evento == "remove_vertice":
+            # As arestas do vértice já foram removidas, uma notificação por vez;
+            # se ele ainda estiver na árvore, a subárvore pendurada nele é refeita.
+            if u in self.dist:
+                self._aumentar(u)
+            self.filhos.pop(u, None)
+            return
+        if evento == "insere_vertice":
+            return
+        arcos = [(u, v)] if self.graph.is_directed() or u == v else [(u, v), (v, u)]
+        if evento == "aresta" and (antigo is None or novo < antigo):
+            for a, b in arcos:
+                self._diminuir(a, b, novo)
+        elif evento == "remove_aresta" or (evento == "aresta" and novo > antigo):
+            for a, b in arcos:
+                if self.pred.get(b) == a:
+                    self._aumentar(b)
+
+    def _diminuir(self, a, b, peso):
+        inf = float('inf')
+        dist = self.dist
+        if a not in dist or dist[a] + peso >= dist.get(b, inf):
+            return
+        dist[b] = dist[a] + peso
+        self._set_pred(b, a)
+        tocados = 0
+        heap = [(dist[b], b)]
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            tocados += 1
+            for y, w in self.graph.neighbors(x):
+                nova = d + w
+                if nova < dist.get(y, inf):
+                    dist[y] = nova
+                    self._set_pred(y, x)
+                    heapq.heappush(heap, (nova, y))
+        self.ultima_atualizacao = tocados
+
+    def _aumentar(self, b):
+        inf = float('inf')
+        dist = self.dist
+        vertices = self.graph.vertices
+        afetados = set()
+        pilha = [b]
+        while pilha:
+            x = pilha.pop()
+            afetados.add(x)
+            pilha.extend(self.filhos.get(x, ()))
+        for x in afetados:
+            self._set_pred(x, None)
+            del dist[x]
+            del self.pred[x]
+        heap = []
+        for x in afetados:
+            melhor, pm = inf, None
+            if x not in vertices:
+                continue
+            for y, w in self.graph.in_neighbors(x):
+                if y not in afetados and y in dist and y in vertices and dist[y] + w < melhor:
+                    melhor, pm = dist[y] + w, y
+            if pm is not None:
+                dist[x] = melhor
+                self._set_pred(x, pm)
+                heapq.heappush(heap, (melhor, x))
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            for y, w in self.graph.neighbors(x):
+                if y in afetados and y in vertices and d + w < dist.get(y, inf):
+                    dist[y] = d + w
+                    self._set_pred(y, x)
+                    heapq.heappush(heap, (d + w, y))
+        self.ultima_atualizacao = len(afetados)
+
+def coordenadas(graph):
+    # Lê coordenadas do campo "peso" dos vértices ("x;y", "x y" ou "x,y").
+    # Vértices sem coordenadas válidas ficam de fora.
+    coords = {}
+    for v, dados in graph.vertices.items():
+        texto = dados["peso"]
+        sep = ";" if ";" in texto else (None if texto.strip().count(" ") else ",")
+        partes = texto.split(sep)
+        if len(partes) == 2:
+            try:
+                coords[v] = (float(partes[0]), float(partes[1]))
+            except ValueError:
+                pass
+    return coords
+
+def astar(graph, origem, destino, coords=None, escala=1.0):
+    # A* com heurística de distância em linha reta, multiplicada por escala. Ela é
+    # admissível quando nenhuma aresta pesa menos que escala * distância euclidiana
+    # entre suas pontas. Vértices sem coordenadas recebem heurística 0 e, como isso
+    # pode torná-la inconsistente, vértices já fechados podem ser reabertos.
+    # Devolve (caminho, distância, vértices expandidos).
+    coords = coordenadas(graph) if coords is None else coords
+    alvo = coords.get(destino)
+    estimativas = {}
+    def h(v):
+        if v not in estimativas:
+            c = coords.get(v)
+            estimativas[v] = 0 if c is None or alvo is None else \
+                escala * math.hypot(c[0] - alvo[0], c[1] - alvo[1])
+        return estimativas[v]
+    dist = {origem: 0}
+    pred = {origem: None}
+    expandidos = 0
+    heap = [(h(origem), 0, origem)]
+    while heap:
+        _, d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        expandidos += 1
+        if u == destino:
+            return reconstruct_path(pred, destino), d, expandidos
+        for v, weight in graph.neighbors(u):
+            nova = d + weight
+            if nova < dist.get(v, float('inf')):
+                dist[v] = nova
+                pred[v] = u
+                heapq.heappush(heap, (nova + h(v), nova, v))
+    return [], float('inf'), expandidos
+
+def bidirectional_dijkstra(graph, origem, destino):
+    # Duas buscas de Dijkstra, para frente a partir da origem e sobre os arcos de
+    # entrada a partir do destino, sempre avançando a de menor fronteira. Para
+    # quando a soma dos topos dos heaps alcança o melhor caminho já visto.
+    # Devolve (caminho, distância, vértices fechados).
+    if origem == destino:
+        return [origem], 0, 1
+    inf = float('inf')
+    dist = ({origem: 0}, {destino: 0})
+    pred = ({origem: None}, {destino: None})
+    fechados = (set(), set())
+    heaps = ([(0, origem)], [(0, destino)])
+    expandir = (graph.neighbors, graph.in_neighbors)
+    melhor, meio = inf, None
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= melhor:
+            break
+        lado = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        d, u = heapq.heappop(heaps[lado])
+        if u in fechados[lado]:
+            continue
+        fechados[lado].add(u)
+        dist_lado, outro = dist[lado], dist[1 - lado]
+        for v, weight in expandir[lado](u):
+            nova = d + weight
+            if nova < dist_lado.get(v, inf):
+                dist_lado[v] = nova
+                pred[lado][v] = u
+                heapq.heappush(heaps[lado], (nova, v))
+            if v in outro and dist_lado[v] + outro[v] < melhor:
+                melhor, meio = dist_lado[v] + outro[v], v
+    total = len(fechados[0]) + len(fechados[1])
+    if meio is None:
+        return [], inf, total
+    caminho = reconstruct_path(pred[0], meio)
+    v = pred[1][meio]
+    while v is not None:
+        caminho.append(v)
+        v = pred[1][v]
+    return caminho, melhor, total
+
+def rota_entre_pontos(graph, hierarquia=None):
+    try:
+        origem = int(input("Origem: "))
+        destino = int(input("Destino: "))
+    except ValueError:
+        print("IDs de vértice devem ser numéricos.")
+        return
+    if origem not in graph.vertices or destino not in graph.vertices:
+        print("Vértice não encontrado.")
+        return
+    coords = coordenadas(graph)
+    if hierarquia is not None and not hierarquia.alterado:
+        caminho, distancia = hierarquia.rota(origem, destino)
+        fechados = None
+        metodo = "hierarquia de contração"
+    elif origem in coords and destino in coords:
+        caminho, distancia, fechados = astar(graph, origem, destino, coords)
+        metodo = "A*"
+    else:
+        caminho, distancia, fechados = bidirectional_dijkstra(graph, origem, destino)
+        metodo = "Dijkstra bidirecional"
+    if not caminho:
+        print("Destino inacessível.")
+        return
+    print(f"Rota ({metodo}): {' -> '.join(map(str, caminho))}")
+    if fechados is None:
+        print(f"Distância: {distancia}")
+    else:
+        print(f"Distância: {distancia} ({fechados} vértices fechados de {len(graph.vertices)})")
+
+def encontrar_ponto_mais_proximo(graph, cache=None):
     try:
         origem = int(input("Informe o ID do vértice onde você está: "))
     except ValueError:
@@ -181,61 +1349,561 @@ def encontrar_ponto_mais_proximo(graph):
     if origem not in graph.vertices:
         print("Vértice não encontrado.")
         return
-    distancias = dijkstra(graph, origem)
-    mais_proximo = sorted((v, d) for v, d in distancias.items() if v != origem and d < float('inf'))
+    quantidade = input("Quantos pontos mais próximos listar (Enter para todos): ").strip()
+    try:
+        k = int(quantidade) if quantidade else None
+    except ValueError:
+        print("Quantidade inválida.")
+        return
+    if cache is not None:
+        distancias, pred = cache.consulta(origem)
+    else:
+        distancias, pred = dijkstra_paths(graph, origem, k=k)
+    mais_proximo = sorted((d, v) for v, d in distancias.items() if v != origem)[:k]
     if not mais_proximo:
         print("Nenhum ponto acessível.")
     else:
-        for v, d in mais_proximo:
-            print(f"  {v} - {graph.vertices[v]['label']} a {d} de distância")
+        for d, v in mais_proximo:
+            rota = " -> ".join(str(x) for x in reconstruct_path(pred, v))
+            print(f"  {v} - {graph.label(v)} a {d} de distância (rota: {rota})")
 
-def prim_mst(graph):
-    if not graph.vertices:
-        print("Grafo vazio.")
-        return
-    start = next(iter(graph.vertices))
-    visited = {start}
+class DisjointSet:
+    # Union-find com compressão de caminho (por divisão pela metade) e união por posto.
+    def __init__(self, items=()):
+        self.parent = {}
+        self.rank = {}
+        self.count = 0
+        for x in items:
+            self.add(x)
+
+    def add(self, x):
+        if x not in self.parent:
+            self.parent[x] = x
+            self.rank[x] = 0
+            self.count += 1
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return False
+        if self.rank[ra] < self.rank[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        if self.rank[ra] == self.rank[rb]:
+            self.rank[ra] += 1
+        self.count -= 1
+        return True
+
+def _prim_heap(graph):
+    visited = set()
     edges = []
     total = 0
-    while len(visited) < len(graph.vertices):
-        candidates = [
-            (float(graph.edges[(min(u, v), max(u, v))]), u, v)
-            for u in visited for v in graph.get_adjacency_list()[u]
-            if v not in visited and (min(u, v), max(u, v)) in graph.edges
-        ]
-        if not candidates:
-            print("Grafo não é conexo.")
-            return
-        cost, u, v = min(candidates)
-        visited.add(v)
-        edges.append((u, v, cost))
-        total += cost
-    print("Árvore Geradora Mínima:")
+    empilhados = 0
+    for root in graph.vertices:
+        if root in visited:
+            continue
+        visited.add(root)
+        heap = [(peso, root, v) for v, peso in graph.neighbors(root) if v not in visited]
+        empilhados += len(heap)
+        heapq.heapify(heap)
+        while heap:
+            peso, u, v = heapq.heappop(heap)
+            if v in visited:
+                continue
+            visited.add(v)
+            edges.append((u, v, peso))
+            total += peso
+            for x, px in graph.neighbors(v):
+                if x not in visited:
+                    heapq.heappush(heap, (px, v, x))
+                    empilhados += 1
+    if PROFILER.ativo:
+        PROFILER.contar("prim.heap_push", empilhados)
+        PROFILER.contar("prim.heap_pop", empilhados)
+    return edges, total
+
+def _kruskal(graph):
+    ds = DisjointSet(graph.vertices)
+    edges = []
+    total = 0
+    ordenadas = sorted(graph.iter_edges(), key=lambda e: e[2])
+    examinadas = 0
+    for u, v, peso in ordenadas:
+        examinadas += 1
+        if ds.union(u, v):
+            edges.append((u, v, peso))
+            total += peso
+            if ds.count == 1:
+                break
+    if PROFILER.ativo:
+        PROFILER.contar("kruskal.arestas_ordenadas", len(ordenadas))
+        PROFILER.contar("kruskal.arestas_examinadas", examinadas)
+    return edges, total
+
+def minimum_spanning_forest(graph, method="prim"):
+    # Floresta geradora mínima: uma árvore por componente, devolvida como
+    # ([(u, v, custo)], custo_total). Em grafos direcionados os arcos são tratados
+    # como arestas e usa-se Kruskal, já que Prim só enxergaria os arcos de saída.
+    if method == "kruskal" or graph.is_directed():
+        return _kruskal(graph)
+    if method != "prim":
+        raise ValueError(f"método desconhecido: {method}")
+    return _prim_heap(graph)
+
+def prim_mst(graph, method="prim"):
+    if not graph.vertices:
+        print("Grafo vazio.")
+        return [], 0
+    edges, total = minimum_spanning_forest(graph, method)
+    componentes = len(graph.vertices) - len(edges)
+    if componentes == 1:
+        print("Árvore Geradora Mínima:")
+    else:
+        print(f"Grafo não é conexo. Floresta Geradora Mínima com {componentes} componentes:")
     for u, v, c in edges:
         print(f"  {u} <--> {v} com custo {c}")
     print(f"Custo total: {total}")
+    return edges, total
+
+def _vizinhanca_simples(graph):
+    # Vizinhos sem laços; em grafos direcionados os arcos valem nos dois sentidos.
+    viz = {v: {w for w, _ in graph.neighbors(v) if w != v} for v in graph.vertices}
+    if graph.is_directed():
+        for v in graph.vertices:
+            viz[v].update(w for w, _ in graph.in_neighbors(v) if w != v)
+    return viz
+
+def _primeira_cor_livre(mascara):
+    # O bit i da máscara marca a cor i + 1 como usada pelos vizinhos.
+    return (~mascara & (mascara + 1)).bit_length()
 
-def colorir_vertices(graph):
+def _guloso(viz, ordem):
     cores = {}
-    adj = graph.get_adjacency_list()
+    for v in ordem:
+        mascara = 0
+        for w in viz[v]:
+            c = cores.get(w)
+            if c:
+                mascara |= 1 << (c - 1)
+        cores[v] = _primeira_cor_livre(mascara)
+    return cores
 
-    for vertice in sorted(graph.vertices):
-        usadas = {cores[vizinho] for vizinho in adj[vertice] if vizinho in cores}
-        cor = 1
-        while cor in usadas:
-            cor += 1
-        cores[vertice] = cor
+def _dsatur(viz):
+    # Fila de saturação em heap com remoção preguiçosa: cada mudança de saturação
+    # empilha uma nova entrada e as antigas são descartadas ao sair.
+    cores = {}
+    mascara = dict.fromkeys(viz, 0)
+    saturacao = dict.fromkeys(viz, 0)
+    heap = [(0, -len(viz[v]), v) for v in viz]
+    empilhados = len(heap)
+    heapq.heapify(heap)
+    while heap:
+        sat, grau, v = heapq.heappop(heap)
+        if v in cores or -sat != saturacao[v]:
+            continue
+        c = _primeira_cor_livre(mascara[v])
+        cores[v] = c
+        bit = 1 << (c - 1)
+        for w in viz[v]:
+            if w not in cores and not mascara[w] & bit:
+                mascara[w] |= bit
+                saturacao[w] += 1
+                heapq.heappush(heap, (-saturacao[w], -len(viz[w]), w))
+                empilhados += 1
+    if PROFILER.ativo:
+        PROFILER.contar("dsatur.heap_push", empilhados)
+    return cores
+
+def _melhorar_coloracao(viz, cores, tempo_limite, semente=None):
+    # Guloso iterado (Culberson): recolorir seguindo as classes de cor em nova
+    # ordem nunca aumenta o número de cores e frequentemente o reduz.
+    rng = random.Random(semente)
+    fim = time.perf_counter() + tempo_limite
+    melhor = cores
+    k = max(cores.values(), default=0)
+    while time.perf_counter() < fim and k > 1:
+        classes = {}
+        for v, c in melhor.items():
+            classes.setdefault(c, []).append(v)
+        grupos = list(classes.values())
+        sorteio = rng.random()
+        if sorteio < 0.5:
+            grupos.sort(key=len, reverse=True)
+        elif sorteio < 0.7:
+            grupos.reverse()
+        else:
+            rng.shuffle(grupos)
+        nova = _guloso(viz, [v for grupo in grupos for v in grupo])
+        nk = max(nova.values(), default=0)
+        if nk <= k:
+            melhor, k = nova, nk
+    return melhor
+
+def colorir(graph, metodo="dsatur", tempo_limite=None):
+    # Coloração de vértices por heurística: "dsatur", "welsh_powell" ou "guloso"
+    # (ordem dos ids). Com tempo_limite (s) roda uma busca de melhoria em seguida.
+    inicio = time.perf_counter()
+    viz = _vizinhanca_simples(graph)
+    if metodo == "dsatur":
+        cores = _dsatur(viz)
+    elif metodo == "welsh_powell":
+        cores = _guloso(viz, sorted(viz, key=lambda v: (-len(viz[v]), v)))
+    elif metodo == "guloso":
+        cores = _guloso(viz, sorted(viz))
+    else:
+        raise ValueError(f"método desconhecido: {metodo}")
+    if tempo_limite:
+        cores = _melhorar_coloracao(viz, cores, tempo_limite)
+    return {"cores": cores, "num_cores": max(cores.values(), default=0),
+            "metodo": metodo, "tempo": time.perf_counter() - inicio}
 
-    print("\nColoração de Vértices (número mínimo de cores):")
+def colorir_vertices(graph, metodo="dsatur", tempo_limite=None):
+    resultado = colorir(graph, metodo, tempo_limite)
+    cores = resultado["cores"]
+    print(f"\nColoração de Vértices (heurística {metodo}):")
     for v in sorted(cores):
-        print(f"  Vértice {v} ({graph.vertices[v]['label']}) -> Cor {cores[v]}")
-    print(f"Total de cores usadas: {max(cores.values())}")
+        print(f"  Vértice {v} ({graph.label(v)}) -> Cor {cores[v]}")
+    print(f"Total de cores usadas: {resultado['num_cores']} ({resultado['tempo']:.4f} s)")
+    return cores
 
-def main():
+def max_flow(graph, fontes, sumidouros):
+    # Fluxo máximo por Dinic, com os pesos das arestas como capacidades (arestas
+    # não direcionadas valem nos dois sentidos). Várias fontes e sumidouros são
+    # ligados a uma superfonte e a um supersumidouro; fontes e sumidouros podem ser
+    # listas (capacidade ilimitada) ou dicionários {vértice: oferta/demanda}.
+    # Devolve valor, fluxo líquido por aresta, o lado da fonte e as arestas do corte mínimo.
+    if not isinstance(fontes, dict):
+        fontes = dict.fromkeys(fontes, float('inf'))
+    if not isinstance(sumidouros, dict):
+        sumidouros = dict.fromkeys(sumidouros, float('inf'))
+    for v in list(fontes) + list(sumidouros):
+        if v not in graph.vertices:
+            raise ValueError(f"vértice {v} não existe")
+    if set(fontes) & set(sumidouros):
+        raise ValueError("um vértice não pode ser fonte e sumidouro ao mesmo tempo")
+    ids = list(graph.vertices)
+    pos = {v: i for i, v in enumerate(ids)}
+    n = len(ids) + 2
+    s, t = n - 2, n - 1
+    # Rede residual em listas paralelas; a aresta e e sua reversa e ^ 1.
+    para, cap, saidas = [], [], [[] for _ in range(n)]
+    def ligar(a, b, c_ida, c_volta):
+        saidas[a].append(len(para))
+        para.append(b)
+        cap.append(c_ida)
+        saidas[b].append(len(para))
+        para.append(a)
+        cap.append(c_volta)
+    originais = []
+    directed = graph.is_directed()
+    for u, v, c in graph.iter_edges():
+        if u == v:
+            continue
+        originais.append((u, v, c, len(para)))
+        ligar(pos[u], pos[v], c, 0 if directed else c)
+    for v, oferta in fontes.items():
+        ligar(s, pos[v], oferta, 0)
+    for v, demanda in sumidouros.items():
+        ligar(pos[v], t, demanda, 0)
+
+    total = 0
+    while True:
+        # Níveis medidos a partir do supersumidouro, sobre a rede residual invertida:
+        # a busca em profundidade só desce de nível, então nunca entra em vértices
+        # que não levam ao sumidouro por um caminho mínimo.
+        nivel = [-1] * n
+        nivel[t] = 0
+        fila = deque([t])
+        retirar, enfileirar = fila.popleft, fila.append
+        while fila:
+            w = retirar()
+            if nivel[s] >= 0:
+                break
+            proximo = nivel[w] + 1
+            for e in saidas[w]:
+                v = para[e]
+                if nivel[v] < 0 and cap[e ^ 1] > 0:
+                    nivel[v] = proximo
+                    enfileirar(v)
+        if nivel[s] < 0:
+            break
+        # Fluxo bloqueante por busca em profundidade iterativa com ponteiro de arco
+        # atual; após cada aumento recua só até a primeira aresta saturada.
+        atual = [0] * n
+        caminho = []
+        u = s
+        while True:
+            if u == t:
+                f = min(cap[e] for e in caminho)
+                if f == float('inf'):
+                    raise ValueError("fluxo ilimitado: fonte e sumidouro ligados só por capacidades infinitas")
+                for e in caminho:
+                    cap[e] -= f
+                    cap[e ^ 1] += f
+                total += f
+                k = next(i for i, e in enumerate(caminho) if cap[e] == 0)
+                u = para[caminho[k] ^ 1]
+                del caminho[k:]
+                continue
+            lista = saidas[u]
+            m = len(lista)
+            i = atual[u]
+            proximo = nivel[u] - 1
+            while i < m:
+                e = lista[i]
+                if cap[e] > 0 and nivel[para[e]] == proximo:
+                    break
+                i += 1
+            atual[u] = i
+            if i < m:
+                caminho.append(lista[i])
+                u = para[lista[i]]
+                continue
+            nivel[u] = -1
+            if not caminho:
+                break
+            e = caminho.pop()
+            u = para[e ^ 1]
+            atual[u] += 1
+
+    alcancados = {s}
+    fila = deque([s])
+    while fila:
+        u = fila.popleft()
+        for e in saidas[u]:
+            if cap[e] > 0 and para[e] not in alcancados:
+                alcancados.add(para[e])
+                fila.append(para[e])
+    fluxos = {}
+    corte = []
+    for u, v, c, e in originais:
+        liquido = c - cap[e]
+        if liquido:
+            fluxos[(u, v)] = liquido
+        ida = pos[u] in alcancados and pos[v] not in alcancados
+        volta = not directed and pos[v] in alcancados and pos[u] not in alcancados
+        if ida or volta:
+            corte.append((u, v, c))
+    lado_fonte = {ids[i] for i in alcancados if i < len(ids)}
+    return {"valor": total, "fluxos": fluxos, "lado_fonte": lado_fonte, "corte_minimo": corte}
+
+def fluxo_maximo(graph):
+    try:
+        fontes = [int(x) for x in input("Pontos de coleta (fontes, separados por vírgula): ").split(",")]
+        sumidouros = [int(x) for x in input("Centros de triagem (sumidouros, separados por vírgula): ").split(",")]
+        resultado = max_flow(graph, fontes, sumidouros)
+    except ValueError as e:
+        print(f"Entrada inválida: {e}")
+        return
+    print(f"Fluxo máximo: {resultado['valor']}")
+    print("Corte mínimo:")
+    for u, v, c in resultado["corte_minimo"]:
+        print(f"  {u} -- {v} capacidade {c}")
+
+def _executar_operacao(graph, op, coords=None, hierarquia=None):
+    # op tem a forma nome[:arg[:arg]], por exemplo dijkstra:1:30,40 ou mst:kruskal.
+    # coords (de coordenadas) é obrigatório para rota:...:astar sobre a forma CSR,
+    # que não guarda o campo "peso" dos vértices. hierarquia é uma
+    # ContracaoPersistente; atualizada, ela responde rota e matriz com alvos.
+    pronta = hierarquia is not None and not hierarquia.alterado
+    nome, _, resto = op.partition(":")
+    args = resto.split(":") if resto else []
+    if nome == "dijkstra":
+        origem = int(args[0])
+        if origem not in graph.vertices:
+            raise ValueError(f"vértice {origem} não existe")
+        alvos = {int(x) for x in args[1].split(",")} if len(args) > 1 else None
+        dist, pred = dijkstra_paths(graph, origem, targets=alvos)
+        destinos = sorted(alvos) if alvos else sorted(dist, key=lambda v: (dist[v], v))
+        return {"operacao": nome, "origem": origem, "resultados": [
+            {"destino": v, "distancia": dist.get(v), "rota": reconstruct_path(pred, v)}
+            for v in destinos]}
+    if nome == "rota":
+        origem, destino = int(args[0]), int(args[1])
+        if origem not in graph.vertices or destino not in graph.vertices:
+            raise ValueError(f"vértice {origem} ou {destino} não existe")
+        metodo = args[2] if len(args) > 2 else ("contracao" if pronta else "bidirecional")
+        if metodo == "astar":
+            caminho, distancia, fechados = astar(graph, origem, destino, coords)
+        elif metodo == "bidirecional":
+            caminho, distancia, fechados = bidirectional_dijkstra(graph, origem, destino)
+        elif metodo == "contracao":
+            if hierarquia is None:
+                raise ValueError("não há hierarquia de contração para este grafo")
+            caminho, distancia = hierarquia.rota(origem, destino)
+            fechados = None
+        else:
+            raise ValueError(f"método desconhecido: {metodo}")
+        return {"operacao": nome, "metodo": metodo, "origem": origem, "destino": destino,
+                "distancia": distancia if caminho else None, "rota": caminho,
+                "vertices_fechados": fechados}
+    if nome == "fluxo":
+        fontes = [int(x) for x in args[0].split(",")]
+        sumidouros = [int(x) for x in args[1].split(",")]
+        resultado = max_flow(graph, fontes, sumidouros)
+        return {"operacao": nome, "fontes": fontes, "sumidouros": sumidouros,
+                "valor": resultado["valor"],
+                "fluxos": [{"u": u, "v": v, "fluxo": f} for (u, v), f in resultado["fluxos"].items()],
+                "corte_minimo": [{"u": u, "v": v, "capacidade": c} for u, v, c in resultado["corte_minimo"]]}
+    if nome == "matriz":
+        origens = [int(x) for x in args[0].split(",")]
+        alvos = [int(x) for x in args[1].split(",")] if len(args) > 1 else sorted(graph.vertices)
+        for v in origens + alvos:
+            if v not in graph.vertices:
+                raise ValueError(f"vértice {v} não existe")
+        if pronta and len(args) > 1:
+            matriz = []
+            for o in origens:
+                dist = hierarquia.distancias(o, alvos)
+                matriz.append([dist[t] for t in alvos])
+        else:
+            matriz = distance_matrix(graph, origens, alvos)
+        return {"operacao": nome, "origens": origens, "alvos": alvos,
+                "distancias": [[d if d < float('inf') else None for d in linha] for linha in matriz]}
+    if nome == "mst":
+        edges, total = minimum_spanning_forest(graph, args[0] if args else "prim")
+        return {"operacao": nome, "custo_total": total,
+                "arestas": [{"u": u, "v": v, "custo": c} for u, v, c in edges]}
+    if nome == "coloracao":
+        metodo = args[0] if args else "dsatur"
+        tempo_limite = float(args[1]) if len(args) > 1 else None
+        resultado = colorir(graph, metodo, tempo_limite)
+        return {"operacao": nome, "metodo": metodo, "num_cores": resultado["num_cores"],
+                "tempo": resultado["tempo"],
+                "cores": {str(v): c for v, c in sorted(resultado["cores"].items())}}
+    if nome == "conexidade":
+        if graph.is_directed():
+            categoria, componentes = classify_connectivity(graph)
+        else:
+            conexo, componentes = graph.is_connected()
+            categoria = "C3" if conexo else "C0"
+        return {"operacao": nome, "categoria": categoria,
+                "componentes": [sorted(c) for c in componentes]}
+    raise ValueError(f"operação desconhecida: {op}")
+
+def _linhas_csv(resultado):
+    nome = resultado["operacao"]
+    if nome == "dijkstra":
+        for r in resultado["resultados"]:
+            yield [nome, resultado["origem"], r["destino"], r["distancia"], " ".join(map(str, r["rota"]))]
+    elif nome == "rota":
+        yield [nome, resultado["origem"], resultado["destino"], resultado["distancia"],
+               " ".join(map(str, resultado["rota"])), resultado["vertices_fechados"]]
+    elif nome == "fluxo":
+        for a in resultado["fluxos"]:
+            yield [nome, a["u"], a["v"], a["fluxo"]]
+        for a in resultado["corte_minimo"]:
+            yield ["corte_minimo", a["u"], a["v"], a["capacidade"]]
+    elif nome == "matriz":
+        for origem, linha in zip(resultado["origens"], resultado["distancias"]):
+            for alvo, d in zip(resultado["alvos"], linha):
+                yield [nome, origem, alvo, d]
+    elif nome == "mst":
+        for a in resultado["arestas"]:
+            yield [nome, a["u"], a["v"], a["custo"]]
+    elif nome == "coloracao":
+        for v, c in resultado["cores"].items():
+            yield [nome, v, c]
+    elif nome == "conexidade":
+        for i, comp in enumerate(resultado["componentes"], 1):
+            for v in comp:
+                yield [nome, resultado["categoria"], i, v]
+
+def executar_lote(argv):
+    # Modo não interativo: carrega o grafo uma vez, aplica as edições, roda as
+    # operações em ordem e emite JSON ou CSV. As mensagens das operações vão para
+    # stderr, deixando stdout só com o resultado.
+    parser = argparse.ArgumentParser(
+        description="Executa algoritmos do Recicla Fluxo sobre um arquivo de grafo.")
+    parser.add_argument("grafo", help="arquivo no formato grafo.txt")
+    parser.add_argument("--edicoes", help="arquivo com linhas de edição (+v, +e, -v, -e)")
+    parser.add_argument("--op", action="append", default=[],
+                        help="dijkstra:ORIGEM[:ALVOS], rota:ORIGEM:DESTINO[:contracao|bidirecional|astar], "
+                             "matriz:ORIGENS[:ALVOS], fluxo:FONTES:SUMIDOUROS, "
+                             "mst[:prim|kruskal], coloracao[:METODO[:SEGUNDOS]] ou conexidade; "
+                             "pode repetir")
+    parser.add_argument("--gravar", help="grava o grafo resultante neste arquivo")
+    parser.add_argument("--formato", choices=["json", "csv"], default="json")
+    parser.add_argument("--saida", help="arquivo de saída (padrão: stdout)")
+    parser.add_argument("--perfil", help="instrumenta a execução e grava um trace neste arquivo; "
+                                         "o resumo vai para stderr")
+    args = parser.parse_args(argv)
+    if args.perfil:
+        PROFILER.ativar(trace=True)
+        try:
+            return _executar_lote(args)
+        finally:
+            PROFILER.desativar()
+            PROFILER.exportar_trace(args.perfil)
+            with contextlib.redirect_stdout(sys.stderr):
+                PROFILER.imprimir_relatorio()
+    return _executar_lote(args)
+
+def _anexar_hierarquia(graph, filename):
+    # Se já existe uma hierarquia de contração ao lado do arquivo, ela passa a ser
+    # refeita sempre que o grafo editado for gravado (ver contracao.py) e responde
+    # as rotas enquanto não houver edições pendentes.
+    if not os.path.exists(filename + ".ch"):
+        return None
+    from contracao import ContracaoPersistente
+    return ContracaoPersistente(graph, filename)
+
+def _executar_lote(args):
+    with contextlib.redirect_stdout(sys.stderr):
+        graph = Graph.load_from_file(args.grafo)
+        if graph is None:
+            return 1
+        hierarquia = _anexar_hierarquia(graph, args.grafo)
+        if args.edicoes:
+            with open(args.edicoes, encoding='utf-8') as f:
+                for line in f:
+                    if not graph.apply_edit_line(line):
+                        return 1
+        try:
+            resultados = [_executar_operacao(graph, op, hierarquia=hierarquia) for op in args.op]
+        except (ValueError, IndexError) as e:
+            print(f"Erro na operação: {e}")
+            return 2
+        if args.gravar:
+            if os.path.abspath(args.gravar) == os.path.abspath(args.grafo):
+                graph.compact(args.gravar)
+            else:
+                graph.write_to_file(args.gravar)
+
+    saida = open(args.saida, 'w', encoding='utf-8', newline='') if args.saida else sys.stdout
+    try:
+        if args.formato == "json":
+            json.dump({"grafo": args.grafo, "vertices": len(graph.vertices),
+                       "arestas": len(graph.edges), "resultados": resultados},
+                      saida, ensure_ascii=False, indent=2)
+            saida.write("\n")
+        else:
+            writer = csv.writer(saida)
+            for resultado in resultados:
+                writer.writerows(_linhas_csv(resultado))
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+    return 0
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        return executar_lote(argv)
     print("=== Gerenciamento de Grafos ===")
     graph = Graph.load_from_file(GRAFO_FILENAME)
     if not graph:
         return
+    graph.open_journal(GRAFO_FILENAME, compact_every=JOURNAL_COMPACT_EVERY)
+    cache = DistanceCache(graph)
+    hierarquia = _anexar_hierarquia(graph, GRAFO_FILENAME)
     while True:
         print("\nMenu:")
         print("a) Ler grafo")
@@ -251,11 +1919,19 @@ def main():
         print("k) Caminho mínimo (Dijkstra)")
         print("l) Árvore Geradora Mínima (Prim)")
         print("m) Coloração de Vértices")
+        print("n) Rota entre dois pontos (A* / Dijkstra bidirecional)")
+        print("o) Fluxo máximo entre pontos de coleta e centros de triagem")
         opc = input("Opção: ").lower().strip()
         if opc == "a":
+            graph.close_journal()
             graph = Graph.load_from_file(GRAFO_FILENAME)
+            if not graph:
+                return
+            graph.open_journal(GRAFO_FILENAME, compact_every=JOURNAL_COMPACT_EVERY)
+            cache = DistanceCache(graph)
+            hierarquia = _anexar_hierarquia(graph, GRAFO_FILENAME)
         elif opc == "b":
-            graph.write_to_file(GRAFO_FILENAME)
+            graph.compact(GRAFO_FILENAME)
         elif opc == "c":
             label = input("Rótulo: ")
             peso = input("Peso: ")
@@ -278,18 +1954,26 @@ def main():
         elif opc == "h":
             graph.display_graph()
         elif opc == "i":
-            conexo, componentes = graph.is_connected()
-            print("Conexo." if conexo else f"Não conexo. Componentes: {componentes}")
+            if graph.is_directed():
+                graph.check_directed_connectivity()
+            else:
+                conexo, componentes = graph.is_connected()
+                print("Conexo." if conexo else f"Não conexo. Componentes: {componentes}")
         elif opc == "j":
+            graph.close_journal()
             break
         elif opc == "k":
-            encontrar_ponto_mais_proximo(graph)
+            encontrar_ponto_mais_proximo(graph, cache)
         elif opc == "l":
             prim_mst(graph)
         elif opc == "m":
             colorir_vertices(graph)
+        elif opc == "n":
+            rota_entre_pontos(graph, hierarquia)
+        elif opc == "o":
+            fluxo_maximo(graph)
         else:
             print("Opção inválida.")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# João Pedro Gianfaldoni -          10409524
+# Matheus Santiago de Brito -       10408953
+# Carlos Eduardo Rosendo Basseto -  10409941
+# Luiz Henrique Ribeiro Pulga -     10409246
+
+# Métricas do grafo inteiro para o planejamento de novos pontos de entrega:
+# graus, componentes, proximidade (closeness) e intermediação (betweenness).
+# Com NumPy/SciPy o grafo vira uma matriz esparsa uma única vez e as contas são
+# vetorizadas; sem eles o mesmo cálculo roda em Python puro sobre a forma CSR.
+# Exemplo:
+#   python analise.py grafo.txt --amostra 200 --workers 4 --saida metricas.csv
+
+import os
+import sys
+import csv
+import heapq
+import random
+import argparse
+import contextlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from GrafosReciclaFluxo import Graph, _componentes_conexas, strongly_connected_components
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    from scipy import sparse
+    from scipy.sparse import csgraph
+    from scipy.sparse.linalg import spsolve_triangular
+except ImportError:
+    sparse = csgraph = spsolve_triangular = None
+
+LINHAS_POR_LOTE = 256
+
+# Estado de cada processo do pool, montado uma vez a partir de _dados_trabalhador.
+_estado = None
+
+def _iniciar_trabalhador(dados):
+    global _estado
+    _estado = _montar_estado(dados)
+
+def _montar_estado(dados):
+    if dados[0] == "numpy":
+        _, indptr, indices, pesos, n = dados
+        m = sparse.csr_matrix((pesos, indices, indptr), shape=(n, n))
+        origem = np.repeat(np.arange(n), np.diff(indptr))
+        return {"backend": "numpy", "n": n, "m": m, "mt": m.T.tocsr(),
+                "origem": origem, "destino": indices, "pesos": pesos}
+    _, offsets, vizinhos, pesos, n = dados
+    reverso = [[] for _ in range(n)]
+    for u in range(n):
+        for k in range(offsets[u], offsets[u + 1]):
+            reverso[vizinhos[k]].append((u, pesos[k]))
+    saida = [list(zip(vizinhos[offsets[u]:offsets[u + 1]], pesos[offsets[u]:offsets[u + 1]]))
+             for u in range(n)]
+    return {"backend": "python", "n": n, "saida": saida, "entrada": reverso}
+
+def _dijkstra_indices(adj, s, n):
+    inf = float('inf')
+    dist = [inf] * n
+    dist[s] = 0
+    heap = [(0, s)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for v, w in adj[u]:
+            nd = d + w
+            if nd < dist[v]:
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return dist
+
+def _proximidade_pivos(pivos):
+    # Soma, para todo v, das distâncias de v até cada pivô alcançável e quantos
+    # pivôs (diferentes de v) foram alcançados. Usa o grafo reverso: uma busca a
+    # partir do pivô p no reverso dá d(v, p) para todos os v de uma vez.
+    e = _estado
+    n = e["n"]
+    if e["backend"] == "numpy":
+        cont = np.zeros(n)
+        soma = np.zeros(n)
+        for i in range(0, len(pivos), LINHAS_POR_LOTE):
+            lote = pivos[i:i + LINHAS_POR_LOTE]
+            dist = csgraph.dijkstra(e["mt"], directed=True, indices=lote)
+            dist[np.arange(len(lote)), lote] = np.inf
+            alcancado = np.isfinite(dist)
+            cont += alcancado.sum(axis=0)
+            soma += np.where(alcancado, dist, 0).sum(axis=0)
+        return cont, soma
+    cont = [0] * n
+    soma = [0] * n
+    inf = float('inf')
+    for p in pivos:
+        dist = _dijkstra_indices(e["entrada"], p, n)
+        for v, d in enumerate(dist):
+            if d < inf and v != p:
+                cont[v] += 1
+                soma[v] += d
+    return cont, soma
+
+def _intermediacao_fontes(fontes):
+    # Acúmulo de dependências de Brandes para um bloco de fontes.
+    e = _estado
+    n = e["n"]
+    if e["backend"] == "numpy":
+        return _brandes_numpy(e, fontes, n)
+    bc = [0.0] * n
+    inf = float('inf')
+    saida = e["saida"]
+    for s in fontes:
+        dist = {s: 0}
+        sigma = [0] * n
+        sigma[s] = 1
+        preds = {s: []}
+        ordem = []
+        heap = [(0, s)]
+        fechados = set()
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in fechados:
+                continue
+            fechados.add(u)
+            ordem.append(u)
+            for v, w in saida[u]:
+                nd = d + w
+                if nd < dist.get(v, inf):
+                    dist[v] = nd
+                    sigma[v] = sigma[u]
+                    preds[v] = [u]
+                    heapq.heappush(heap, (nd, v))
+                elif nd == dist[v] and v not in fechados:
+                    sigma[v] += sigma[u]
+                    preds[v].append(u)
+        delta = [0.0] * n
+        for w in reversed(ordem):
+            for u in preds[w]:
+                delta[u] += sigma[u] / sigma[w] * (1 + delta[w])
+            if w != s:
+                bc[w] += delta[w]
+    return bc
+
+def _brandes_numpy(e, fontes, n):
+    # As distâncias vêm do Dijkstra em C do SciPy, em lotes de fontes. O DAG de
+    # caminhos mínimos de cada fonte é uma máscara sobre todas as arestas; com os
+    # vértices ordenados pela distância ele vira uma matriz triangular, e sigma
+    # (número de caminhos) e delta (dependência) saem de dois sistemas
+    # triangulares esparsos em vez de um laço em Python por vértice.
+    origem, destino, pesos = e["origem"], e["destino"], e["pesos"]
+    identidade = sparse.identity(n, format="csr")
+    bc = np.zeros(n)
+    for i in range(0, len(fontes), LINHAS_POR_LOTE):
+        lote = fontes[i:i + LINHAS_POR_LOTE]
+        for s, dist in zip(lote, csgraph.dijkstra(e["m"], directed=True, indices=lote)):
+            du, dv = dist[origem], dist[destino]
+            # Igualdade exata, como no backend em Python: o Dijkstra soma os mesmos
+            # floats, então os arcos da árvore sempre satisfazem a igualdade.
+            dag = (du < dv) & (du + pesos == dv)
+            ordem = np.argsort(dist, kind="stable")
+            pos = np.empty(n, dtype=np.int64)
+            pos[ordem] = np.arange(n)
+            u, v = pos[origem[dag]], pos[destino[dag]]
+            # sigma[v] = [v = s] + soma de sigma[u] sobre arcos u -> v do DAG.
+            base = np.zeros(n)
+            base[pos[s]] = 1
+            a = sparse.csr_matrix((np.ones(len(u)), (v, u)), shape=(n, n))
+            sigma = spsolve_triangular(identidade - a, base, lower=True)
+            # delta[u] = soma sobre arcos u -> v de sigma[u] / sigma[v] * (1 + delta[v]).
+            razao = np.divide(sigma[u], sigma[v], out=np.zeros(len(u)), where=sigma[v] > 0)
+            b = sparse.csr_matrix((razao, (u, v)), shape=(n, n))
+            delta = spsolve_triangular(identidade - b, b @ np.ones(n), lower=False)
+            delta[pos[s]] = 0
+            bc[ordem] += delta
+    return bc
+
+class Analise:
+    # Exporta o grafo uma vez (CSR em índices 0..n-1, na ordem de ids) e calcula
+    # as métricas. Os resultados são vetores alinhados com self.ids: arrays do
+    # NumPy no backend "numpy", listas no backend "python"; por_vertice converte
+    # para {id: valor}.
+    def __init__(self, graph, backend=None, workers=None):
+        if backend is None:
+            backend = "numpy" if np is not None and sparse is not None else "python"
+        if backend == "numpy" and (np is None or sparse is None):
+            raise ValueError("backend numpy exige NumPy e SciPy instalados")
+        if backend not in ("numpy", "python"):
+            raise ValueError(f"backend desconhecido: {backend}")
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self.graph = graph
+        csr = graph.to_csr() if isinstance(graph, Graph) else graph
+        self.directed = graph.is_directed()
+        self.ids = list(csr.ids)
+        self.n = n = len(self.ids)
+        if backend == "numpy":
+            ids = np.frombuffer(csr.ids, dtype=np.int64)
+            indptr = np.frombuffer(csr.offsets, dtype=np.int64)
+            indices = np.searchsorted(ids, np.frombuffer(csr.targets, dtype=np.int64))
+            pesos = np.frombuffer(csr.weights, dtype=np.float64)
+            self._dados = ("numpy", indptr, indices, pesos, n)
+            self._peso_minimo = pesos.min() if len(pesos) else None
+        else:
+            index = {vid: i for i, vid in enumerate(self.ids)}
+            self._dados = ("python", list(csr.offsets), [index[t] for t in csr.targets],
+                           list(csr.weights), n)
+            self._peso_minimo = min(self._dados[3], default=None)
+        self._local = _montar_estado(self._dados)
+
+    def por_vertice(self, valores):
+        return {vid: (valores[i].item() if hasattr(valores[i], "item") else valores[i])
+                for i, vid in enumerate(self.ids)}
+
+    def graus(self, sentido="saida", ponderado=False):
+        # Em grafos não direcionados cada aresta aparece nos dois sentidos da forma
+        # CSR, então "saida" já é o grau.
+        if sentido not in ("saida", "entrada"):
+            raise ValueError(f"sentido desconhecido: {sentido}")
+        if not self.directed:
+            sentido = "saida"
+        e = self._local
+        if self.backend == "numpy":
+            m = e["m"] if sentido == "saida" else e["mt"]
+            if ponderado:
+                return np.asarray(m.sum(axis=1)).ravel()
+            return np.diff(m.indptr)
+        adj = e["saida"] if sentido == "saida" else e["entrada"]
+        if ponderado:
+            return [sum(w for _, w in arcos) for arcos in adj]
+        return [len(arcos) for arcos in adj]
+
+    def distribuicao_graus(self, sentido="saida"):
+        # {grau: quantidade de vértices}.
+        graus = self.graus(sentido)
+        if self.backend == "numpy":
+            contagem = np.bincount(graus) if self.n else np.zeros(0, dtype=np.int64)
+            return {g: int(c) for g, c in enumerate(contagem) if c}
+        return dict(sorted(Counter(graus).items()))
+
+    def componentes(self, conexao="fraca"):
+        # Devolve (rótulo da componente por vértice, tamanho de cada componente).
+        # conexao="forte" só faz diferença em grafos direcionados.
+        if conexao not in ("fraca", "forte"):
+            raise ValueError(f"conexão desconhecida: {conexao}")
+        if self.backend == "numpy":
+            total, rotulos = csgraph.connected_components(
+                self._local["m"], directed=self.directed,
+                connection="strong" if conexao == "forte" else "weak")
+            return rotulos, np.bincount(rotulos, minlength=total)
+        csr = self.graph.to_csr() if isinstance(self.graph, Graph) else self.graph
+        if conexao == "forte" and self.directed:
+            comps = strongly_connected_components(csr)
+        else:
+            comps = _componentes_conexas(csr)[1]
+        index = {vid: i for i, vid in enumerate(self.ids)}
+        rotulos = [0] * self.n
+        for c, comp in enumerate(comps):
+            for v in comp:
+                rotulos[index[v]] = c
+        return rotulos, [len(comp) for comp in comps]
+
+    def _amostra(self, amostra, semente):
+        todos = list(range(self.n))
+        if amostra is None or amostra >= self.n:
+            return todos
+        return sorted(random.Random(semente).sample(todos, amostra))
+
+    def _paralelo(self, func, itens, combinar):
+        # Divide itens (fontes ou pivôs) entre os processos; cada um recebe os
+        # vetores CSR uma vez na inicialização, como em distance_matrix.
+        workers = min(self.workers, max(1, len(itens)))
+        if workers == 1:
+            global _estado
+            anterior, _estado = _estado, self._local
+            try:
+                return func(itens)
+            finally:
+                _estado = anterior
+        tamanho = max(1, len(itens) // (workers * 4))
+        blocos = [itens[i:i + tamanho] for i in range(0, len(itens), tamanho)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_trabalhador,
+                                 initargs=(self._dados,)) as pool:
+            parciais = list(pool.map(func, blocos))
+        return combinar(parciais)
+
+    def _somar(self, parciais):
+        if self.backend == "numpy":
+            return sum(parciais[1:], parciais[0])
+        return [sum(col) for col in zip(*parciais)]
+
+    def proximidade(self, amostra=None, semente=None):
+        # Proximidade de Wasserman–Faust pelas distâncias de saída de cada vértice:
+        # (r / (n - 1)) * (r / soma), com r os vértices alcançados. Com amostra, a
+        # soma e r são estimados a partir de distâncias até pivôs sorteados.
+        pivos = self._amostra(amostra, semente)
+        if self.backend == "numpy":
+            combinar = lambda ps: tuple(sum(p[i] for p in ps) for i in (0, 1))
+        else:
+            combinar = lambda ps: tuple([sum(col) for col in zip(*(p[i] for p in ps))] for i in (0, 1))
+        cont, soma = self._paralelo(_proximidade_pivos, pivos, combinar)
+        pivo = set(pivos)
+        if self.backend == "numpy":
+            base = np.full(self.n, float(len(pivos)))
+            base[pivos] -= 1
+            with np.errstate(divide="ignore", invalid="ignore"):
+                valores = (cont / base) * (cont / soma)
+            return np.where((cont > 0) & (soma > 0), valores, 0.0)
+        resultado = []
+        for i in range(self.n):
+            base = len(pivos) - (1 if i in pivo else 0)
+            resultado.append((cont[i] / base) * (cont[i] / soma[i]) if cont[i] and soma[i] else 0.0)
+        return resultado
+
+    def intermediacao(self, amostra=None, semente=None, normalizar=False):
+        # Brandes com pesos. Com amostra, só as fontes sorteadas são processadas e
+        # o resultado é escalado por n / amostra. Arestas de peso zero deixam a
+        # contagem de caminhos mínimos indefinida (empates entre vértices à mesma
+        # distância, ciclos de custo zero), então os pesos precisam ser positivos.
+        if self._peso_minimo is not None and self._peso_minimo <= 0:
+            raise ValueError("intermediação exige pesos de aresta positivos")
+        fontes = self._amostra(amostra, semente)
+        bc = self._paralelo(_intermediacao_fontes, fontes, self._somar)
+        escala = self.n / len(fontes) if fontes else 0
+        if not self.directed:
+            escala /= 2
+        if normalizar and self.n > 2:
+            escala /= (self.n - 1) * (self.n - 2) / (1 if self.directed else 2)
+        if self.backend == "numpy":
+            return bc * escala
+        return [x * escala for x in bc]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Métricas por ponto de coleta do Recicla Fluxo.")
+    parser.add_argument("grafo", help="arquivo no formato grafo.txt")
+    parser.add_argument("--backend", choices=["numpy", "python"], help="padrão: numpy se instalado")
+    parser.add_argument("--amostra", type=int, help="fontes/pivôs sorteados (padrão: cálculo exato)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--workers", type=int, help="processos (padrão: nº de CPUs)")
+    parser.add_argument("--saida", help="arquivo CSV (padrão: saída padrão)")
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        graph = Graph.load_from_file(args.grafo)
+    if graph is None:
+        return 1
+    try:
+        analise = Analise(graph, args.backend, args.workers)
+        colunas = {
+            "grau": analise.graus(),
+            "grau_ponderado": analise.graus(ponderado=True),
+            "componente": analise.componentes()[0],
+            "proximidade": analise.proximidade(args.amostra, args.semente),
+            "intermediacao": analise.intermediacao(args.amostra, args.semente, normalizar=True),
+        }
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+    if analise.directed:
+        colunas["grau_entrada"] = analise.graus("entrada")
+        colunas["componente_forte"] = analise.componentes("forte")[0]
+    saida = open(args.saida, 'w', encoding='utf-8', newline='') if args.saida else sys.stdout
+    try:
+        writer = csv.writer(saida)
+        writer.writerow(["id", "label"] + list(colunas))
+        for i, vid in enumerate(analise.ids):
+            writer.writerow([vid, graph.label(vid)] + [
+                valores[i].item() if hasattr(valores[i], "item") else valores[i]
+                for valores in colunas.values()])
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+    print(f"Backend {analise.backend}, {analise.n} vértices.", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# João Pedro Gianfaldoni -          10409524
+# Matheus Santiago de Brito -       10408953
+# Carlos Eduardo Rosendo Basseto -  10409941
+# Luiz Henrique Ribeiro Pulga -     10409246
+
+# Gera grafos sintéticos no formato de grafo.txt e mede os algoritmos de
+# GrafosReciclaFluxo.py. Exemplo:
+#   python benchmark.py --tipos grade geometrico --tamanhos 1000 100000 --saida atual.json
+#   python benchmark.py --tamanhos 1000 --comparar atual.json
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import contextlib
+
+from GrafosReciclaFluxo import (
+    Graph, dijkstra, minimum_spanning_forest, colorir, strongly_connected_components,
+)
+
+def _gravar_grafo(filename, n, arestas):
+    # Mesmo formato de Graph.write_to_file (tipo 2, arestas nos dois sentidos),
+    # escrito em fluxo para não montar o arquivo inteiro em memória.
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(f"2\n{n}")
+        for vid in range(1, n + 1):
+            f.write(f'\n{vid} "{vid}" ""')
+        f.write(f"\n{2 * len(arestas)}")
+        for (u, v), peso in arestas.items():
+            f.write(f"\n{u} {v} {peso}\n{v} {u} {peso}")
+
+def gerar_grade(n, rng):
+    # Malha viária: grade quase quadrada com ~10% dos trechos removidos e
+    # algumas diagonais, pesos em metros.
+    lado = max(1, int(math.sqrt(n)))
+    arestas = {}
+    for vid in range(1, n + 1):
+        j = (vid - 1) % lado
+        vizinhos = [vid + 1 if j + 1 < lado else None, vid + lado, vid + lado + 1 if j + 1 < lado else None]
+        for k, w in enumerate(vizinhos):
+            if w is None or w > n:
+                continue
+            if k < 2 and rng.random() < 0.1:
+                continue
+            if k == 2 and rng.random() > 0.05:
+                continue
+            arestas[(vid, w)] = rng.randint(80, 400) * (2 if k == 2 else 1)
+    return arestas
+
+def gerar_geometrico(n, rng, grau=6):
+    # Grafo geométrico aleatório no quadrado unitário: liga pontos a menos de r,
+    # com r escolhido para dar o grau médio pedido. Peso = distância em metros.
+    raio = math.sqrt(grau / (math.pi * n))
+    pontos = [(rng.random(), rng.random()) for _ in range(n)]
+    celulas = {}
+    for idx, (x, y) in enumerate(pontos):
+        celulas.setdefault((int(x / raio), int(y / raio)), []).append(idx)
+    arestas = {}
+    for idx, (x, y) in enumerate(pontos):
+        cx, cy = int(x / raio), int(y / raio)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for outro in celulas.get((cx + dx, cy + dy), ()):
+                    if outro > idx:
+                        d = math.dist(pontos[idx], pontos[outro])
+                        if d < raio:
+                            arestas[(idx + 1, outro + 1)] = max(1, round(d * 10000))
+    return arestas
+
+def gerar_livre_escala(n, rng, m=3):
+    # Barabási–Albert: cada vértice novo liga-se a m vértices escolhidos com
+    # probabilidade proporcional ao grau.
+    arestas = {}
+    alvos = list(range(1, min(m, n) + 1))
+    repetidos = []
+    for vid in range(len(alvos) + 1, n + 1):
+        for alvo in set(alvos):
+            arestas[(alvo, vid)] = rng.randint(100, 5000)
+        repetidos.extend(alvos)
+        repetidos.extend([vid] * m)
+        alvos = [rng.choice(repetidos) for _ in range(m)]
+    return arestas
+
+GERADORES = {
+    "grade": gerar_grade,
+    "geometrico": gerar_geometrico,
+    "livre_escala": gerar_livre_escala,
+}
+
+def _medir(func, memoria):
+    inicio = time.perf_counter()
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        resultado = func()
+    tempo = time.perf_counter() - inicio
+    pico = None
+    if memoria:
+        # Segunda execução só para o pico: tracemalloc deixa o código mais lento.
+        tracemalloc.start()
+        with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+            func()
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return resultado, tempo, pico
+
+def executar(tipo, n, repeticoes, memoria, diretorio, semente):
+    rng = random.Random(semente)
+    arestas = GERADORES[tipo](n, rng)
+    arquivo = os.path.join(diretorio, f"bench_{tipo}_{n}.txt")
+    _gravar_grafo(arquivo, n, arestas)
+    del arestas
+    graph, tempo_carga, pico_carga = _medir(lambda: Graph.load_from_file(arquivo), memoria)
+    saida = arquivo + ".out"
+    origens = [rng.choice(list(graph.vertices)) for _ in range(repeticoes)]
+    operacoes = {
+        "write_to_file": lambda: graph.write_to_file(saida),
+        "dijkstra": lambda: [dijkstra(graph, o) for o in origens],
+        "prim_mst": lambda: minimum_spanning_forest(graph, "prim"),
+        "kruskal": lambda: minimum_spanning_forest(graph, "kruskal"),
+        "colorir_vertices": lambda: colorir(graph),
+        "is_connected": lambda: graph.is_connected(),
+        "scc": lambda: strongly_connected_components(graph),
+    }
+    medidas = {"load_from_file": {"tempo": tempo_carga, "pico_memoria": pico_carga}}
+    for nome, func in operacoes.items():
+        _, tempo, pico = _medir(func, memoria)
+        if nome == "dijkstra":
+            tempo /= repeticoes
+        medidas[nome] = {"tempo": tempo, "pico_memoria": pico}
+    for f in (arquivo, saida):
+        if os.path.exists(f):
+            os.remove(f)
+    return {"tipo": tipo, "vertices": len(graph.vertices), "arestas": len(graph.edges),
+            "operacoes": medidas}
+
+def _revisao():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+def comparar(atual, anterior):
+    chave = lambda r: (r["tipo"], r["vertices"])
+    antes = {chave(r): r for r in anterior["resultados"]}
+    print(f"{'grafo':<24}{'operação':<18}{'antes (s)':>12}{'agora (s)':>12}{'razão':>9}")
+    for r in atual["resultados"]:
+        base = antes.get(chave(r))
+        if base is None:
+            continue
+        for op, m in r["operacoes"].items():
+            b = base["operacoes"].get(op)
+            if b is None or not b["tempo"]:
+                continue
+            print(f"{r['tipo'] + ' ' + str(r['vertices']):<24}{op:<18}"
+                  f"{b['tempo']:>12.4f}{m['tempo']:>12.4f}{m['tempo'] / b['tempo']:>9.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos algoritmos do Recicla Fluxo.")
+    parser.add_argument("--tipos", nargs="+", choices=sorted(GERADORES), default=sorted(GERADORES))
+    parser.add_argument("--tamanhos", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--repeticoes", type=int, default=3, help="origens sorteadas para o Dijkstra")
+    parser.add_argument("--sem-memoria", action="store_true", help="não mede o pico de memória")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="onde gravar os grafos gerados")
+    parser.add_argument("--saida", help="arquivo JSON com os resultados")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args(argv)
+
+    resultados = []
+    for tipo in args.tipos:
+        for n in args.tamanhos:
+            r = executar(tipo, n, args.repeticoes, not args.sem_memoria, args.dir, args.semente)
+            resultados.append(r)
+            resumo = ", ".join(f"{op} {m['tempo']:.3f}s" for op, m in r["operacoes"].items())
+            print(f"{tipo} V={r['vertices']} E={r['arestas']}: {resumo}", file=sys.stderr)
+    atual = {
+        "revisao": _revisao(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "resultados": resultados,
+    }
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(atual, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(atual, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(atual, json.load(f))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
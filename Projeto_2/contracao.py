@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+# João Pedro Gianfaldoni -          10409524
+# Matheus Santiago de Brito -       10408953
+# Carlos Eduardo Rosendo Basseto -  10409941
+# Luiz Henrique Ribeiro Pulga -     10409246
+
+# Hierarquia de contração (CH) para consultas ponto a ponto e um-para-muitos.
+# O pré-processamento contrai os vértices em ordem de importância, criando
+# atalhos; a consulta é uma busca bidirecional que só sobe na hierarquia.
+# A hierarquia fica em grafo.txt.ch, ao lado do grafo. Exemplo:
+#   python contracao.py grafo.txt construir
+#   python contracao.py grafo.txt rota 1 7
+#   python contracao.py grafo.txt distancias 1 3,4,5
+
+import os
+import sys
+import json
+import mmap
+import time
+import heapq
+import struct
+import hashlib
+import argparse
+import contextlib
+from array import array
+
+from GrafosReciclaFluxo import Graph, bidirectional_dijkstra
+
+CONTRACAO_HEADER = "<8sqqqqq"
+LIMITE_TESTEMUNHA = 200
+
+def _contracao_magic():
+    return b"RFCONTR" + (b"L" if sys.byteorder == "little" else b"B")
+
+def assinatura(graph):
+    # Resumo do conteúdo do grafo (vértices, arestas e pesos), usado para saber
+    # se uma hierarquia gravada ainda corresponde ao grafo.
+    directed = graph.is_directed()
+    h = hashlib.sha256(f"{graph.graph_type}\n".encode())
+    h.update(array('q', sorted(graph.vertices)).tobytes())
+    arestas = sorted((u, v, float(p)) if directed or u <= v else (v, u, float(p))
+                     for u, v, p in graph.iter_edges())
+    for u, v, p in arestas:
+        h.update(struct.pack("<qqd", u, v, p))
+    return h.hexdigest()
+
+def _busca_testemunha(saida, u, excluido, limite, alvos, max_fechados):
+    # Dijkstra local a partir de u sem passar por excluido, interrompida ao passar
+    # de limite, ao fechar todos os alvos ou ao fechar max_fechados vértices.
+    dist = {u: 0}
+    fechados = set()
+    restantes = len(alvos)
+    heap = [(0, u)]
+    while heap and len(fechados) < max_fechados:
+        d, x = heapq.heappop(heap)
+        if x in fechados:
+            continue
+        if d > limite:
+            break
+        fechados.add(x)
+        if x in alvos:
+            restantes -= 1
+            if not restantes:
+                break
+        for y, (p, _) in saida[x].items():
+            if y == excluido:
+                continue
+            nd = d + p
+            if nd < dist.get(y, float('inf')):
+                dist[y] = nd
+                heapq.heappush(heap, (nd, y))
+    return dist
+
+class HierarquiaContracao:
+    # Índices internos 0..n-1 seguem ids (ordenados). Para cada vértice x ficam,
+    # em forma CSR, os arcos x -> y com y acima de x (acima_*) e os arcos y -> x
+    # com y acima de x (abaixo_*); meio é o vértice contraído que o atalho
+    # substitui, ou -1 para arestas originais.
+    def __init__(self, graph_type, ids, rank, acima, abaixo, assinatura):
+        self.graph_type = graph_type
+        self.ids = ids
+        self.index = {vid: i for i, vid in enumerate(ids)}
+        self.rank = rank
+        self.acima_off, self.acima_alvo, self.acima_peso, self.acima_meio = acima
+        self.abaixo_off, self.abaixo_orig, self.abaixo_peso, self.abaixo_meio = abaixo
+        self.assinatura = assinatura
+
+    @classmethod
+    def construir(cls, graph, ordem=None):
+        # Sem ordem, a ordem de contração sai de uma fila de prioridade (diferença
+        # de arestas + vizinhos já contraídos, com atualização preguiçosa). Com a
+        # ordem de uma hierarquia anterior só os pesos mudam de papel: os vértices
+        # são recontraídos na mesma ordem, o que dispensa escolher a ordem de novo.
+        ids = array('q', sorted(graph.vertices))
+        index = {vid: i for i, vid in enumerate(ids)}
+        n = len(ids)
+        saida = [{} for _ in range(n)]
+        entrada = [{} for _ in range(n)]
+        for vid in ids:
+            u = index[vid]
+            for w, p in graph.neighbors(vid):
+                w = index[w]
+                if w != u and p < saida[u].get(w, (float('inf'),))[0]:
+                    saida[u][w] = (p, -1)
+                    entrada[w][u] = (p, -1)
+        acima = [None] * n
+        abaixo = [None] * n
+        rank = array('q', [0]) * n
+        contraidos_viz = [0] * n
+
+        def atalhos(v):
+            novos = []
+            saidas = list(saida[v].items())
+            if not saidas or not entrada[v]:
+                return novos
+            alvos = set(saida[v])
+            maior = max(p for p, _ in saida[v].values())
+            for u, (pu, _) in entrada[v].items():
+                if not alvos - {u}:
+                    continue
+                dist = _busca_testemunha(saida, u, v, pu + maior, alvos - {u}, LIMITE_TESTEMUNHA)
+                for w, (pw, _) in saidas:
+                    if w != u and dist.get(w, float('inf')) > pu + pw:
+                        novos.append((u, w, pu + pw))
+            return novos
+
+        def prioridade(v, novos):
+            return len(novos) - len(saida[v]) - len(entrada[v]) + contraidos_viz[v]
+
+        def contrair(v, novos, nivel):
+            for u, w, d in novos:
+                if d < saida[u].get(w, (float('inf'),))[0]:
+                    saida[u][w] = (d, v)
+                    entrada[w][u] = (d, v)
+            for w in saida[v]:
+                del entrada[w][v]
+                contraidos_viz[w] += 1
+            for u in entrada[v]:
+                del saida[u][v]
+                contraidos_viz[u] += 1
+            acima[v] = saida[v]
+            abaixo[v] = entrada[v]
+            rank[v] = nivel
+
+        if ordem is not None:
+            for nivel, vid in enumerate(ordem):
+                v = index[vid]
+                contrair(v, atalhos(v), nivel)
+        else:
+            heap = []
+            for v in range(n):
+                heap.append((prioridade(v, atalhos(v)), v))
+            heapq.heapify(heap)
+            nivel = 0
+            while heap:
+                _, v = heapq.heappop(heap)
+                novos = atalhos(v)
+                p = prioridade(v, novos)
+                if heap and p > heap[0][0]:
+                    heapq.heappush(heap, (p, v))
+                    continue
+                contrair(v, novos, nivel)
+                nivel += 1
+
+        def para_csr(listas):
+            off, viz, pesos, meios = array('q', [0]), array('q'), array('d'), array('q')
+            for arcos in listas:
+                for y, (p, m) in arcos.items():
+                    viz.append(y)
+                    pesos.append(p)
+                    meios.append(m)
+                off.append(len(viz))
+            return off, viz, pesos, meios
+
+        return cls(graph.graph_type, ids, rank, para_csr(acima), para_csr(abaixo), assinatura(graph))
+
+    def ordem(self):
+        ordem = [0] * len(self.ids)
+        for i, nivel in enumerate(self.rank):
+            ordem[nivel] = self.ids[i]
+        return ordem
+
+    def atalhos(self):
+        return sum(1 for m in self.acima_meio if m >= 0) + sum(1 for m in self.abaixo_meio if m >= 0)
+
+    def salvar(self, filename):
+        # Mesmo esquema de save_snapshot: cabeçalho, vetores nativos e JSON no fim,
+        # num temporário renomeado ao final.
+        blob = json.dumps({"assinatura": self.assinatura}).encode('utf-8')
+        header = struct.pack(CONTRACAO_HEADER, _contracao_magic(), self.graph_type, len(self.ids),
+                             len(self.acima_alvo), len(self.abaixo_orig), len(blob))
+        temp = filename + ".tmp"
+        with open(temp, 'wb') as f:
+            f.write(header)
+            for buf in (self.ids, self.rank, self.acima_off, self.acima_alvo, self.acima_peso,
+                        self.acima_meio, self.abaixo_off, self.abaixo_orig, self.abaixo_peso,
+                        self.abaixo_meio):
+                f.write(buf)
+            f.write(blob)
+        os.replace(temp, filename)
+
+    @classmethod
+    def abrir(cls, filename):
+        # Os vetores são visões do arquivo mapeado em memória, como em open_snapshot.
+        with open(filename, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, graph_type, n, m_acima, m_abaixo, blob_len = struct.unpack_from(CONTRACAO_HEADER, mm)
+        if magic[:7] != _contracao_magic()[:7]:
+            raise ValueError(f"{filename} não é uma hierarquia de contração")
+        view = memoryview(mm)
+        bufs = []
+        pos = struct.calcsize(CONTRACAO_HEADER)
+        formatos = [('q', n), ('q', n),
+                    ('q', n + 1), ('q', m_acima), ('d', m_acima), ('q', m_acima),
+                    ('q', n + 1), ('q', m_abaixo), ('d', m_abaixo), ('q', m_abaixo)]
+        for fmt, count in formatos:
+            buf = view[pos:pos + 8 * count].cast(fmt)
+            if magic != _contracao_magic():
+                buf = array(fmt, buf)
+                buf.byteswap()
+            bufs.append(buf)
+            pos += 8 * count
+        extras = json.loads(bytes(view[pos:pos + blob_len]).decode('utf-8'))
+        return cls(graph_type, bufs[0], bufs[1], bufs[2:6], bufs[6:10], extras["assinatura"])
+
+    def _subir(self, heap, dist, pred, arcos, contrarios):
+        # Fecha um vértice de uma das buscas e relaxa seus arcos para cima. Com
+        # stall-on-demand: se algum vizinho acima já chega a x por um caminho mais
+        # curto (arcos contrários), x não está num caminho mínimo e não é expandido.
+        d, x = heapq.heappop(heap)
+        if d > dist[x]:
+            return None
+        off, viz, pesos = contrarios
+        for k in range(off[x], off[x + 1]):
+            y = viz[k]
+            if y in dist and dist[y] + pesos[k] < d:
+                return x
+        off, viz, pesos = arcos
+        for k in range(off[x], off[x + 1]):
+            y = viz[k]
+            nd = d + pesos[k]
+            if nd < dist.get(y, float('inf')):
+                dist[y] = nd
+                pred[y] = x
+                heapq.heappush(heap, (nd, y))
+        return x
+
+    def _busca(self, s, t):
+        inf = float('inf')
+        df, db = {s: 0}, {t: 0}
+        pf, pb = {s: None}, {t: None}
+        hf, hb = [(0, s)], [(0, t)]
+        acima = (self.acima_off, self.acima_alvo, self.acima_peso)
+        abaixo = (self.abaixo_off, self.abaixo_orig, self.abaixo_peso)
+        lados = ((hf, df, pf, db, acima, abaixo), (hb, db, pb, df, abaixo, acima))
+        melhor, encontro = (0, s) if s == t else (inf, None)
+        while (hf and hf[0][0] < melhor) or (hb and hb[0][0] < melhor):
+            for heap, dist, pred, outro, arcos, contrarios in lados:
+                if not heap or heap[0][0] >= melhor:
+                    continue
+                x = self._subir(heap, dist, pred, arcos, contrarios)
+                if x is not None and x in outro and dist[x] + outro[x] < melhor:
+                    melhor, encontro = dist[x] + outro[x], x
+        return melhor, encontro, pf, pb
+
+    def _meio(self, a, b):
+        # O arco a -> b está nos arcos para cima de a ou nos arcos para baixo de b.
+        if self.rank[b] > self.rank[a]:
+            off, viz, meios, x = self.acima_off, self.acima_alvo, self.acima_meio, a
+            y = b
+        else:
+            off, viz, meios, x = self.abaixo_off, self.abaixo_orig, self.abaixo_meio, b
+            y = a
+        for k in range(off[x], off[x + 1]):
+            if viz[k] == y:
+                return meios[k]
+        raise KeyError((a, b))
+
+    def _desempacotar(self, caminho):
+        # Troca cada atalho pelos dois arcos que ele substitui, sem recursão.
+        saida = [caminho[0]]
+        pilha = [(a, b) for a, b in zip(caminho, caminho[1:])][::-1]
+        while pilha:
+            a, b = pilha.pop()
+            m = self._meio(a, b)
+            if m < 0:
+                saida.append(b)
+            else:
+                pilha.append((m, b))
+                pilha.append((a, m))
+        return saida
+
+    def distancia(self, origem, destino):
+        melhor, _, _, _ = self._busca(self.index[origem], self.index[destino])
+        return melhor
+
+    def rota(self, origem, destino):
+        # Devolve (caminho, distância); caminho vazio se o destino é inalcançável.
+        melhor, x, pf, pb = self._busca(self.index[origem], self.index[destino])
+        if x is None:
+            return [], melhor
+        caminho = []
+        y = x
+        while y is not None:
+            caminho.append(y)
+            y = pf[y]
+        caminho.reverse()
+        y = pb[x]
+        while y is not None:
+            caminho.append(y)
+            y = pb[y]
+        return [self.ids[i] for i in self._desempacotar(caminho)], melhor
+
+    def distancias(self, origem, alvos):
+        # Um-para-muitos: o espaço de subida da origem é explorado uma vez e cada
+        # alvo faz só a sua própria busca para cima.
+        acima = (self.acima_off, self.acima_alvo, self.acima_peso)
+        abaixo = (self.abaixo_off, self.abaixo_orig, self.abaixo_peso)
+        s = self.index[origem]
+        df, heap = {s: 0}, [(0, s)]
+        while heap:
+            self._subir(heap, df, {}, acima, abaixo)
+        inf = float('inf')
+        resultado = {}
+        for alvo in alvos:
+            t = self.index[alvo]
+            db, heap = {t: 0}, [(0, t)]
+            melhor = df.get(t, inf)
+            while heap and heap[0][0] < melhor:
+                x = self._subir(heap, db, {}, abaixo, acima)
+                if x is not None and x in df and df[x] + db[x] < melhor:
+                    melhor = df[x] + db[x]
+            resultado[alvo] = melhor
+        return resultado
+
+class ContracaoPersistente:
+    # Mantém filename + ".ch" de acordo com o grafo. Registra-se como observador:
+    # depois de uma edição, quando write_to_file grava filename, a hierarquia é
+    # refeita. Se o conjunto de vértices é o da hierarquia atual, os vértices são
+    # recontraídos na ordem guardada; senão ela é construída do zero. A
+    # comparação é feita pelos ids, sem depender da ordem dos eventos.
+    # Enquanto há edições não gravadas, as consultas usam o Dijkstra bidirecional.
+    def __init__(self, graph, filename, automatico=True):
+        self.graph = graph
+        self.filename = filename
+        self.caminho = filename + ".ch"
+        self.automatico = automatico
+        self.hierarquia = None
+        self.alterado = False
+        if os.path.exists(self.caminho):
+            try:
+                self.hierarquia = HierarquiaContracao.abrir(self.caminho)
+            except (ValueError, KeyError, struct.error):
+                self.hierarquia = None
+        if self.hierarquia is None or self.hierarquia.assinatura != assinatura(graph):
+            self.alterado = True
+            self.atualizar()
+        graph.add_listener(self._ao_editar)
+
+    def fechar(self):
+        self.graph.remove_listener(self._ao_editar)
+
+    def _ao_editar(self, evento, u, v, antigo, novo):
+        if evento == "gravado":
+            if (self.automatico and self.alterado
+                    and os.path.abspath(u) == os.path.abspath(self.filename)):
+                self.atualizar()
+            return
+        self.alterado = True
+
+    def atualizar(self):
+        if self.hierarquia is not None and list(self.hierarquia.ids) == sorted(self.graph.vertices):
+            modo = "personalizada"
+            self.hierarquia = HierarquiaContracao.construir(self.graph, self.hierarquia.ordem())
+        else:
+            modo = "construída"
+            self.hierarquia = HierarquiaContracao.construir(self.graph)
+        self.hierarquia.salvar(self.caminho)
+        self.alterado = False
+        print(f"Hierarquia de contração {modo} e gravada em {self.caminho}.")
+
+    def rota(self, origem, destino):
+        if self.alterado:
+            caminho, distancia, _ = bidirectional_dijkstra(self.graph, origem, destino)
+            return caminho, distancia
+        return self.hierarquia.rota(origem, destino)
+
+    def distancias(self, origem, alvos):
+        if self.alterado:
+            return {t: bidirectional_dijkstra(self.graph, origem, t)[1] for t in alvos}
+        return self.hierarquia.distancias(origem, alvos)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hierarquia de contração do Recicla Fluxo.")
+    parser.add_argument("grafo", help="arquivo no formato grafo.txt")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("construir", help="constrói do zero e grava grafo.txt.ch")
+    p_rota = sub.add_parser("rota", help="caminho mínimo entre dois vértices")
+    p_rota.add_argument("origem", type=int)
+    p_rota.add_argument("destino", type=int)
+    p_dist = sub.add_parser("distancias", help="distâncias de uma origem a vários alvos")
+    p_dist.add_argument("origem", type=int)
+    p_dist.add_argument("alvos", help="ids separados por vírgula")
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        graph = Graph.load_from_file(args.grafo)
+        if graph is None:
+            return 1
+        inicio = time.perf_counter()
+        if args.comando == "construir":
+            hierarquia = HierarquiaContracao.construir(graph)
+            hierarquia.salvar(args.grafo + ".ch")
+            print(f"{hierarquia.atalhos()} atalhos em {time.perf_counter() - inicio:.2f}s.")
+            return 0
+        ch = ContracaoPersistente(graph, args.grafo)
+    try:
+        if args.comando == "rota":
+            caminho, distancia = ch.rota(args.origem, args.destino)
+            resultado = {"origem": args.origem, "destino": args.destino,
+                         "distancia": distancia if caminho else None, "rota": caminho}
+        else:
+            alvos = [int(x) for x in args.alvos.split(",")]
+            resultado = {"origem": args.origem, "distancias": [
+                {"destino": t, "distancia": d if d < float('inf') else None}
+                for t, d in ch.distancias(args.origem, alvos).items()]}
+    except KeyError as e:
+        print(f"Erro: vértice {e} não existe", file=sys.stderr)
+        return 2
+    json.dump(resultado, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# João Pedro Gianfaldoni -          10409524
+# Matheus Santiago de Brito -       10408953
+# Carlos Eduardo Rosendo Basseto -  10409941
+# Luiz Henrique Ribeiro Pulga -     10409246
+
+# Roteirização de caminhões com capacidade (CVRP) sobre as distâncias de caminho
+# mínimo do grafo: construção por economias (Clarke–Wright) ou vizinho mais
+# próximo, seguida de busca local 2-opt e Or-opt dentro de um tempo limite.
+# Exemplo:
+#   python roteirizacao.py grafo.txt --deposito 1 --capacidade 10 --tempo 5
+
+import sys
+import json
+import time
+import heapq
+import argparse
+import contextlib
+
+from GrafosReciclaFluxo import Graph, distance_matrix, dijkstra_paths, reconstruct_path
+
+VIZINHOS_GRANULARES = 30
+
+class MatrizDistancias:
+    # Guarda matrizes já calculadas por conjunto de vértices e as descarta quando
+    # o grafo é editado (via observadores de Graph). fechar cancela a inscrição.
+    def __init__(self, graph, workers=None):
+        self.graph = graph
+        self.workers = workers
+        self._matrizes = {}
+        if isinstance(graph, Graph):
+            graph.add_listener(self._ao_editar)
+
+    def fechar(self):
+        if isinstance(self.graph, Graph):
+            self.graph.remove_listener(self._ao_editar)
+        self._matrizes.clear()
+
+    def _ao_editar(self, evento, u, v, antigo, novo):
+        if evento in ("aresta", "remove_aresta", "remove_vertice"):
+            self._matrizes.clear()
+
+    def obter(self, vertices):
+        chave = tuple(vertices)
+        if chave not in self._matrizes:
+            self._matrizes[chave] = distance_matrix(self.graph, chave, chave, workers=self.workers)
+        return self._matrizes[chave]
+
+def _custo_rota(d, rota):
+    if not rota:
+        return 0
+    total = d[0][rota[0]] + d[rota[-1]][0]
+    for a, b in zip(rota, rota[1:]):
+        total += d[a][b]
+    return total
+
+def _vizinhos(d, n, k):
+    # Os k pontos mais próximos de cada ponto (índices 1..n), nos dois sentidos.
+    return [[]] + [heapq.nsmallest(k, (j for j in range(1, n + 1) if j != i),
+                                   key=lambda j: min(d[i][j], d[j][i])) for i in range(1, n + 1)]
+
+def _economias(d, n, demanda, capacidade, vizinhos):
+    # Clarke–Wright paralelo, só com pares de vizinhos próximos para não gerar
+    # n² economias. Ligar o fim da rota de i ao início da rota de j economiza
+    # d[i][0] + d[0][j] - d[i][j].
+    rota_de = {i: [i] for i in range(1, n + 1)}
+    carga = {i: demanda[i] for i in range(1, n + 1)}
+    economias = []
+    for i in range(1, n + 1):
+        for j in vizinhos[i]:
+            s = d[i][0] + d[0][j] - d[i][j]
+            if s > 0:
+                economias.append((s, i, j))
+    economias.sort(reverse=True)
+    for _, i, j in economias:
+        ri, rj = rota_de[i], rota_de[j]
+        if ri is rj or ri[-1] != i or rj[0] != j:
+            continue
+        if carga[ri[0]] + carga[rj[0]] > capacidade:
+            continue
+        nova_carga = carga[ri[0]] + carga[rj[0]]
+        ri.extend(rj)
+        for p in rj:
+            rota_de[p] = ri
+        carga[ri[0]] = nova_carga
+    vistas = set()
+    rotas = []
+    for rota in rota_de.values():
+        if id(rota) not in vistas:
+            vistas.add(id(rota))
+            rotas.append(rota)
+    return rotas
+
+def _vizinho_mais_proximo(d, n, demanda, capacidade):
+    restantes = set(range(1, n + 1))
+    rotas = []
+    while restantes:
+        rota, carga, atual = [], 0, 0
+        while True:
+            candidatos = [p for p in restantes if carga + demanda[p] <= capacidade]
+            if not candidatos:
+                break
+            p = min(candidatos, key=lambda q: d[atual][q])
+            rota.append(p)
+            carga += demanda[p]
+            restantes.discard(p)
+            atual = p
+        if not rota:
+            # Ponto com demanda maior que a capacidade: vai sozinho num caminhão.
+            p = restantes.pop()
+            rota = [p]
+        rotas.append(rota)
+    return rotas
+
+def _dois_opt(d, rota, fim):
+    # 2-opt com somas prefixas nos dois sentidos, o que mantém o delta O(1) também
+    # quando a matriz é assimétrica (grafo direcionado).
+    melhorou = False
+    while time.perf_counter() < fim:
+        k = len(rota)
+        ida = [0] * k
+        volta = [0] * k
+        for t in range(1, k):
+            ida[t] = ida[t - 1] + d[rota[t - 1]][rota[t]]
+            volta[t] = volta[t - 1] + d[rota[t]][rota[t - 1]]
+        achou = False
+        for i in range(k - 1):
+            a = rota[i - 1] if i > 0 else 0
+            for j in range(i + 1, k):
+                b = rota[j + 1] if j + 1 < k else 0
+                delta = (d[a][rota[j]] + d[rota[i]][b] - d[a][rota[i]] - d[rota[j]][b]
+                         + (volta[j] - volta[i]) - (ida[j] - ida[i]))
+                if delta < -1e-9:
+                    rota[i:j + 1] = rota[i:j + 1][::-1]
+                    achou = melhorou = True
+                    break
+            if achou:
+                break
+        if not achou:
+            break
+    return melhorou
+
+def _or_opt(d, rotas, cargas, demanda, capacidade, vizinhos, fim):
+    # Move segmentos de 1 a 3 pontos, sem inverter, para junto de um vizinho
+    # próximo na mesma rota ou em outra com capacidade livre.
+    onde = {}
+    for r, rota in enumerate(rotas):
+        for pos, p in enumerate(rota):
+            onde[p] = (r, pos)
+    melhorou = False
+    for tamanho in (1, 2, 3):
+        for p in list(onde):
+            if time.perf_counter() >= fim:
+                return melhorou
+            r, i = onde[p]
+            rota = rotas[r]
+            segmento = rota[i:i + tamanho]
+            if len(segmento) < tamanho:
+                continue
+            a = rota[i - 1] if i > 0 else 0
+            b = rota[i + tamanho] if i + tamanho < len(rota) else 0
+            s0, s1 = segmento[0], segmento[-1]
+            ganho_remocao = d[a][s0] + d[s1][b] - d[a][b]
+            carga_seg = sum(demanda[x] for x in segmento)
+            melhor = None
+            for viz in vizinhos[s0]:
+                if viz in segmento:
+                    continue
+                rv, pv = onde[viz]
+                if rv != r and cargas[rv] + carga_seg > capacidade:
+                    continue
+                destino = rotas[rv]
+                # Inserir antes ou depois do vizinho.
+                for q in (pv, pv + 1):
+                    antes = destino[q - 1] if q > 0 else 0
+                    depois = destino[q] if q < len(destino) else 0
+                    if antes in segmento or depois in segmento:
+                        continue
+                    custo = d[antes][s0] + d[s1][depois] - d[antes][depois]
+                    if rv == r and (antes == a and depois == b):
+                        continue
+                    delta = custo - ganho_remocao
+                    if delta < -1e-9 and (melhor is None or delta < melhor[0]):
+                        melhor = (delta, rv, destino[q - 1] if q > 0 else None)
+            if melhor is None:
+                continue
+            _, rv, ancora = melhor
+            del rota[i:i + tamanho]
+            destino = rotas[rv]
+            q = destino.index(ancora) + 1 if ancora is not None else 0
+            destino[q:q] = segmento
+            cargas[r] -= carga_seg
+            cargas[rv] += carga_seg
+            for rr in {r, rv}:
+                for pos, x in enumerate(rotas[rr]):
+                    onde[x] = (rr, pos)
+            melhorou = True
+    return melhorou
+
+def resolver_rotas(graph, deposito, pontos, capacidade, demandas=None, tempo_limite=5.0,
+                   construcao="economias", matrizes=None, expandir=False):
+    # Devolve um dicionário com as rotas (pontos na ordem de visita, carga e
+    # distância), a distância total, os pontos inalcançáveis e os tempos gastos.
+    # demandas é {ponto: quantidade} (padrão 1 por ponto); matrizes é uma
+    # MatrizDistancias reaproveitada entre chamadas. Sem ela a matriz é calculada
+    # só para esta chamada, sem se inscrever no grafo.
+    inicio = time.perf_counter()
+    if deposito not in graph.vertices:
+        raise ValueError(f"depósito {deposito} não existe")
+    pontos = [p for p in dict.fromkeys(pontos) if p != deposito]
+    for p in pontos:
+        if p not in graph.vertices:
+            raise ValueError(f"ponto {p} não existe")
+    demandas = demandas or {}
+    nos = [deposito] + pontos
+    if matrizes is not None:
+        d = matrizes.obter(nos)
+    else:
+        d = distance_matrix(graph, nos, nos)
+    inf = float('inf')
+    inalcancaveis = [p for i, p in enumerate(pontos, 1) if d[0][i] == inf or d[i][0] == inf]
+    if inalcancaveis:
+        # Recorta as linhas e colunas alcançáveis da matriz já calculada.
+        fora = set(inalcancaveis)
+        manter = [0] + [i for i, p in enumerate(pontos, 1) if p not in fora]
+        pontos = [p for p in pontos if p not in fora]
+        nos = [deposito] + pontos
+        d = [[d[i][j] for j in manter] for i in manter]
+    tempo_matriz = time.perf_counter() - inicio
+    n = len(pontos)
+    demanda = [0] + [demandas.get(p, 1) for p in pontos]
+    vizinhos = _vizinhos(d, n, VIZINHOS_GRANULARES)
+
+    if construcao == "economias":
+        rotas = _economias(d, n, demanda, capacidade, vizinhos)
+    elif construcao == "vizinho":
+        rotas = _vizinho_mais_proximo(d, n, demanda, capacidade)
+    else:
+        raise ValueError(f"construção desconhecida: {construcao}")
+    custo_inicial = sum(_custo_rota(d, r) for r in rotas)
+
+    # O tempo limite vale para a busca local; a matriz fica de fora porque vem do
+    # cache na maioria das chamadas.
+    fim = time.perf_counter() + tempo_limite
+    cargas = [sum(demanda[p] for p in r) for r in rotas]
+    while time.perf_counter() < fim:
+        melhorou = False
+        for rota in rotas:
+            if time.perf_counter() >= fim:
+                break
+            melhorou |= _dois_opt(d, rota, fim)
+        melhorou |= _or_opt(d, rotas, cargas, demanda, capacidade, vizinhos, fim)
+        if not melhorou:
+            break
+    rotas_finais = [(r, c) for r, c in zip(rotas, cargas) if r]
+
+    resultado = []
+    for rota, carga in rotas_finais:
+        item = {"pontos": [nos[i] for i in rota], "carga": carga, "distancia": _custo_rota(d, rota)}
+        if expandir:
+            caminho = [deposito]
+            for a, b in zip([deposito] + item["pontos"], item["pontos"] + [deposito]):
+                caminho.extend(reconstruct_path(dijkstra_paths(graph, a, targets={b})[1], b)[1:])
+            item["caminho"] = caminho
+        resultado.append(item)
+    return {"deposito": deposito, "capacidade": capacidade, "rotas": resultado,
+            "distancia_total": sum(r["distancia"] for r in resultado),
+            "distancia_construcao": custo_inicial, "inalcancaveis": inalcancaveis,
+            "tempo_matriz": tempo_matriz, "tempo": time.perf_counter() - inicio}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monta rotas de coleta para vários caminhões.")
+    parser.add_argument("grafo", help="arquivo no formato grafo.txt")
+    parser.add_argument("--deposito", type=int, required=True)
+    parser.add_argument("--pontos", help="ids separados por vírgula (padrão: todos os outros vértices)")
+    parser.add_argument("--capacidade", type=float, required=True, help="capacidade de cada caminhão")
+    parser.add_argument("--demandas", help="JSON {ponto: demanda}; padrão 1 por ponto")
+    parser.add_argument("--tempo", type=float, default=5.0, help="tempo limite da busca local (s)")
+    parser.add_argument("--construcao", choices=["economias", "vizinho"], default="economias")
+    parser.add_argument("--expandir", action="store_true", help="inclui o caminho completo nas ruas")
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        graph = Graph.load_from_file(args.grafo)
+    if graph is None:
+        return 1
+    pontos = [int(p) for p in args.pontos.split(",")] if args.pontos else sorted(graph.vertices)
+    demandas = None
+    if args.demandas:
+        with open(args.demandas, encoding='utf-8') as f:
+            demandas = {int(k): v for k, v in json.load(f).items()}
+    try:
+        resultado = resolver_rotas(graph, args.deposito, pontos, args.capacidade, demandas,
+                                   args.tempo, args.construcao, expandir=args.expandir)
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+    json.dump(resultado, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# João Pedro Gianfaldoni -          10409524
+# Matheus Santiago de Brito -       10408953
+# Carlos Eduardo Rosendo Basseto -  10409941
+# Luiz Henrique Ribeiro Pulga -     10409246
+
+# Serviço HTTP (asyncio) que carrega o grafo uma vez e responde consultas de
+# vários despachantes ao mesmo tempo. Exemplo:
+#   python servidor.py grafo.txt --porta 8080
+#   curl 'http://127.0.0.1:8080/caminho?origem=1&destino=7'
+#   curl -X POST -d '{"u": 1, "v": 7, "peso": "12"}' http://127.0.0.1:8080/arestas
+#
+# Rotas (respostas em JSON):
+#   GET    /estado
+#   GET    /caminho?origem=1&destino=7
+#   GET    /distancias?origem=1[&alvos=3,4]
+#   GET    /proximos?origem=1[&k=5]
+#   GET    /rota?origem=1&destino=7[&metodo=contracao|bidirecional|astar]
+#   GET    /mst[?metodo=prim|kruskal]
+#   GET    /conexidade
+#   POST   /arestas          corpo {"u": 1, "v": 7, "peso": "12"}
+#   DELETE /arestas?u=1&v=7
+
+import io
+import os
+import sys
+import json
+import signal
+import asyncio
+import argparse
+import contextlib
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit, parse_qs
+
+import GrafosReciclaFluxo
+from GrafosReciclaFluxo import (
+    Graph, parse_peso, dijkstra_paths, reconstruct_path, coordenadas, _executar_operacao,
+    _anexar_hierarquia, JOURNAL_COMPACT_EVERY,
+)
+
+MAX_CORPO = 1 << 20
+ARVORES_EM_CACHE = 64
+# Edições repassadas aos processos a cada tarefa antes de o pool ser recriado
+# com o grafo inteiro.
+EDICOES_POR_POOL = 256
+
+# Com fork os processos do pool herdariam os sockets dos clientes abertos e a
+# conexão não fecharia de fato quando o servidor a encerra.
+_CONTEXTO = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+# Executados nos processos do pool. Cada processo guarda uma cópia do grafo da
+# criação do pool e recebe, junto com cada tarefa, a lista de edições feitas
+# desde então; aplica as que ainda não viu e consulta a forma CSR, refeita só
+# depois de alguma edição. Ctrl+C é tratado só pelo processo principal, que
+# encerra o pool.
+
+_grafo_processo = None
+_edicoes_aplicadas = 0
+_coords_processo = None
+
+def _iniciar_processo(graph_type, vertices, edges, coords):
+    global _grafo_processo, _edicoes_aplicadas, _coords_processo
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _grafo_processo = Graph(graph_type, vertices, edges)
+    _edicoes_aplicadas = 0
+    _coords_processo = coords
+
+def _grafo_atualizado(edicoes):
+    global _edicoes_aplicadas
+    if len(edicoes) > _edicoes_aplicadas:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for metodo, *args in edicoes[_edicoes_aplicadas:]:
+                getattr(_grafo_processo, metodo)(*args)
+        _edicoes_aplicadas = len(edicoes)
+    return _grafo_processo.to_csr()
+
+def _trabalho_arvore(edicoes, origem):
+    return dijkstra_paths(_grafo_atualizado(edicoes), origem)
+
+def _trabalho_operacao(edicoes, op):
+    return _executar_operacao(_grafo_atualizado(edicoes), op, _coords_processo)
+
+class ErroRequisicao(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+def _inteiro(params, nome, obrigatorio=True):
+    valor = params.get(nome)
+    if valor is None:
+        if obrigatorio:
+            raise ErroRequisicao(400, f"parâmetro {nome} ausente")
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ErroRequisicao(400, f"parâmetro {nome} inválido: {valor}")
+
+class ServidorGrafo:
+    # Leituras usam um pool de processos; cada escrita incrementa a versão e
+    # entra na lista de edições que acompanha as tarefas seguintes, e o pool só é
+    # recriado quando essa lista passa de EDICOES_POR_POOL. As coordenadas do A*
+    # são lidas uma vez aqui, já que o servidor não edita vértices. Árvores de
+    # caminhos mínimos são pedidas uma vez por (versão, origem): requisições
+    # simultâneas para a mesma origem aguardam o mesmo futuro. As escritas passam
+    # por um asyncio.Lock e usam insert_edge/remove_edge, inclusive o diário, como
+    # no menu; a compactação a cada compact_every edições roda numa thread, para
+    # não parar as leituras enquanto grafo.txt é regravado. Com uma hierarquia de
+    # contração (ContracaoPersistente) sem edições pendentes, /rota e /distancias
+    # com alvos são respondidas por ela no próprio processo.
+    def __init__(self, graph, workers=None, compact_every=None, hierarquia=None):
+        self.graph = graph
+        self.workers = workers or os.cpu_count() or 1
+        self.compact_every = compact_every
+        self.hierarquia = hierarquia
+        self.versao = 0
+        self._pool = None
+        self._edicoes = []
+        self._coords = coordenadas(graph)
+        self._escrita = asyncio.Lock()
+        self._arvores = OrderedDict()
+        self._operacoes = {}
+        self.coalescidas = 0
+        self.calculadas = 0
+
+    def _pool_atual(self):
+        if self._pool is None or len(self._edicoes) > EDICOES_POR_POOL:
+            if self._pool is not None:
+                # Tarefas já enviadas ao pool antigo terminam normalmente.
+                self._pool.shutdown(wait=False)
+            g = self.graph
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_CONTEXTO,
+                                             initializer=_iniciar_processo,
+                                             initargs=(g.graph_type, dict(g.vertices), dict(g.edges),
+                                                       self._coords))
+            self._edicoes = []
+        return self._pool
+
+    async def _no_pool(self, func, arg):
+        # Se um processo do pool morrer (falta de memória, SIGKILL), o pool fica
+        # quebrado: ele é descartado e a tarefa é tentada uma vez num pool novo.
+        for tentativa in range(2):
+            pool = self._pool_atual()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool, func, self._edicoes, arg)
+            except BrokenProcessPool:
+                if self._pool is pool:
+                    print("Pool de processos quebrado; recriando.", file=sys.stderr)
+                    pool.shutdown(wait=False)
+                    self._pool = None
+                    self._edicoes = []
+                if tentativa:
+                    raise
+
+    async def arvore(self, origem):
+        if origem not in self.graph.vertices:
+            raise ErroRequisicao(404, f"vértice {origem} não existe")
+        chave = (self.versao, origem)
+        futuro = self._arvores.get(chave)
+        if futuro is not None:
+            self.coalescidas += 1
+            self._arvores.move_to_end(chave)
+        else:
+            self.calculadas += 1
+            futuro = asyncio.ensure_future(self._no_pool(_trabalho_arvore, origem))
+            self._arvores[chave] = futuro
+            futuro.add_done_callback(lambda f: self._descartar_falha(chave, f))
+            while len(self._arvores) > ARVORES_EM_CACHE:
+                self._arvores.popitem(last=False)
+        return await asyncio.shield(futuro)
+
+    def _descartar_falha(self, chave, futuro, cache=None):
+        # Falhas não ficam no cache: a próxima requisição tenta de novo.
+        cache = self._arvores if cache is None else cache
+        if futuro.cancelled() or futuro.exception() is not None:
+            if cache.get(chave) is futuro:
+                del cache[chave]
+
+    async def operacao(self, op, cache=True):
+        # Operações sem parâmetros (mst, conexidade) ficam guardadas por versão.
+        if not cache:
+            return await self._no_pool(_trabalho_operacao, op)
+        chave = (self.versao, op)
+        futuro = self._operacoes.get(chave)
+        if futuro is None:
+            self._operacoes = {k: f for k, f in self._operacoes.items() if k[0] == self.versao}
+            futuro = asyncio.ensure_future(self._no_pool(_trabalho_operacao, op))
+            self._operacoes[chave] = futuro
+            futuro.add_done_callback(lambda f: self._descartar_falha(chave, f, self._operacoes))
+        else:
+            self.coalescidas += 1
+        return await asyncio.shield(futuro)
+
+    async def _editar(self, metodo, *args):
+        async with self._escrita:
+            saida = io.StringIO()
+            with contextlib.redirect_stdout(saida):
+                getattr(self.graph, metodo)(*args)
+            # Cópia nova: tarefas já enviadas levam a lista da versão anterior.
+            self._edicoes = self._edicoes + [(metodo, *args)]
+            self.versao += 1
+            self._arvores.clear()
+            g = self.graph
+            if self.compact_every and g.journal is not None and g._journal_entries >= self.compact_every:
+                await asyncio.get_running_loop().run_in_executor(None, self._compactar)
+            return saida.getvalue().strip()
+
+    def _hierarquia_pronta(self):
+        return self.hierarquia is not None and not self.hierarquia.alterado
+
+    def _compactar(self):
+        # Na thread só se lê o grafo; as escritas esperam o asyncio.Lock. Uma
+        # hierarquia anexada é refeita aqui também, ao ser avisada da gravação.
+        with contextlib.redirect_stdout(sys.stderr):
+            self.graph.compact()
+
+    async def tratar(self, metodo, caminho, params, corpo):
+        if caminho == "/estado":
+            return {"versao": self.versao, "vertices": len(self.graph.vertices),
+                    "arestas": len(self.graph.edges), "workers": self.workers,
+                    "arvores_calculadas": self.calculadas, "coalescidas": self.coalescidas}
+        if caminho == "/arestas":
+            if metodo == "POST":
+                try:
+                    dados = json.loads(corpo or b"{}")
+                    u, v, peso = int(dados["u"]), int(dados["v"]), str(dados["peso"])
+                except (ValueError, KeyError, TypeError):
+                    raise ErroRequisicao(400, 'corpo esperado: {"u": id, "v": id, "peso": "valor"}')
+                if u not in self.graph.vertices or v not in self.graph.vertices:
+                    raise ErroRequisicao(404, "Um ou ambos os vértices não existem.")
+                try:
+                    parse_peso(peso)
+                except ValueError:
+                    raise ErroRequisicao(400, f"Peso inválido: {peso}")
+                return {"mensagem": await self._editar("insert_edge", u, v, peso), "versao": self.versao}
+            if metodo == "DELETE":
+                u, v = _inteiro(params, "u"), _inteiro(params, "v")
+                if self.graph.edge_key(u, v) not in self.graph.edges:
+                    raise ErroRequisicao(404, "Aresta não encontrada.")
+                return {"mensagem": await self._editar("remove_edge", u, v), "versao": self.versao}
+            raise ErroRequisicao(405, f"método {metodo} não permitido em /arestas")
+        if metodo != "GET":
+            raise ErroRequisicao(405, f"método {metodo} não permitido em {caminho}")
+        if caminho == "/caminho":
+            origem, destino = _inteiro(params, "origem"), _inteiro(params, "destino")
+            if destino not in self.graph.vertices:
+                raise ErroRequisicao(404, f"vértice {destino} não existe")
+            dist, pred = await self.arvore(origem)
+            return {"origem": origem, "destino": destino, "distancia": dist.get(destino),
+                    "rota": reconstruct_path(pred, destino)}
+        if caminho == "/distancias":
+            origem = _inteiro(params, "origem")
+            alvos = None
+            if "alvos" in params:
+                try:
+                    alvos = [int(x) for x in params["alvos"].split(",")]
+                except ValueError:
+                    raise ErroRequisicao(400, f"parâmetro alvos inválido: {params['alvos']}")
+            if alvos is not None and self._hierarquia_pronta():
+                if origem not in self.graph.vertices:
+                    raise ErroRequisicao(404, f"vértice {origem} não existe")
+                dist = self.hierarquia.distancias(origem, [v for v in alvos if v in self.graph.vertices])
+                dist = {v: d for v, d in dist.items() if d < float('inf')}
+            else:
+                dist, _ = await self.arvore(origem)
+                if alvos is None:
+                    alvos = sorted(dist, key=lambda v: (dist[v], v))
+            return {"origem": origem, "distancias": [{"destino": v, "distancia": dist.get(v)} for v in alvos]}
+        if caminho == "/proximos":
+            origem = _inteiro(params, "origem")
+            k = _inteiro(params, "k", obrigatorio=False)
+            dist, pred = await self.arvore(origem)
+            proximos = sorted((d, v) for v, d in dist.items() if v != origem)[:k]
+            return {"origem": origem, "proximos": [
+                {"destino": v, "label": self.graph.label(v), "distancia": d, "rota": reconstruct_path(pred, v)}
+                for d, v in proximos]}
+        if caminho == "/rota":
+            origem, destino = _inteiro(params, "origem"), _inteiro(params, "destino")
+            metodo_rota = params.get("metodo")
+            if metodo_rota in (None, "contracao") and self.hierarquia is not None:
+                if self._hierarquia_pronta():
+                    try:
+                        return _executar_operacao(self.graph, f"rota:{origem}:{destino}:contracao",
+                                                  hierarquia=self.hierarquia)
+                    except ValueError as e:
+                        raise ErroRequisicao(400, str(e))
+                # Com edições ainda não gravadas, como em ContracaoPersistente.rota.
+                metodo_rota = "bidirecional"
+            metodo_rota = metodo_rota or "bidirecional"
+            return await self._operacao_validada(f"rota:{origem}:{destino}:{metodo_rota}", cache=False)
+        if caminho == "/mst":
+            return await self._operacao_validada(f"mst:{params.get('metodo', 'prim')}")
+        if caminho == "/conexidade":
+            return await self._operacao_validada("conexidade")
+        raise ErroRequisicao(404, f"rota desconhecida: {caminho}")
+
+    async def _operacao_validada(self, op, cache=True):
+        try:
+            return await self.operacao(op, cache)
+        except ValueError as e:
+            raise ErroRequisicao(400, str(e))
+
+    async def conexao(self, reader, writer):
+        # HTTP/1.1 mínimo com keep-alive; um cliente pode mandar várias requisições.
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha:
+                    break
+                try:
+                    metodo, alvo, versao_http = linha.decode('latin-1').split()
+                except ValueError:
+                    await self._responder(writer, 400, {"erro": "requisição malformada"}, False)
+                    break
+                cabecalhos = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    nome, _, valor = h.decode('latin-1').partition(":")
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                try:
+                    tamanho = int(cabecalhos.get("content-length", 0) or 0)
+                except ValueError:
+                    tamanho = -1
+                if tamanho < 0:
+                    await self._responder(writer, 400, {"erro": "Content-Length inválido"}, False)
+                    break
+                if tamanho > MAX_CORPO:
+                    await self._responder(writer, 413, {"erro": "corpo grande demais"}, False)
+                    break
+                corpo = await reader.readexactly(tamanho) if tamanho else b""
+                manter = (cabecalhos.get("connection", "").lower() != "close"
+                          and versao_http.upper() == "HTTP/1.1")
+                partes = urlsplit(alvo)
+                params = {k: v[-1] for k, v in parse_qs(partes.query).items()}
+                try:
+                    status, resposta = 200, await self.tratar(metodo.upper(), partes.path, params, corpo)
+                except ErroRequisicao as e:
+                    status, resposta = e.status, {"erro": str(e)}
+                except Exception as e:
+                    print(f"Erro ao tratar {metodo} {alvo}: {e!r}", file=sys.stderr)
+                    status, resposta = 500, {"erro": "erro interno"}
+                await self._responder(writer, status, resposta, manter)
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _responder(self, writer, status, resposta, manter):
+        motivos = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                   413: "Payload Too Large", 500: "Internal Server Error"}
+        corpo = json.dumps(resposta, ensure_ascii=False).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status} {motivos.get(status, '')}\r\n"
+                     f"Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(corpo)}\r\n"
+                     f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n".encode('latin-1') + corpo)
+        await writer.drain()
+
+    def fechar(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+async def servir(graph, host="127.0.0.1", porta=8080, socket_unix=None, workers=None,
+                 compact_every=None, hierarquia=None):
+    servidor = ServidorGrafo(graph, workers, compact_every, hierarquia)
+    if socket_unix:
+        srv = await asyncio.start_unix_server(servidor.conexao, path=socket_unix)
+        onde = socket_unix
+    else:
+        srv = await asyncio.start_server(servidor.conexao, host, porta)
+        onde = f"http://{host}:{porta}"
+    print(f"Servindo {len(graph.vertices)} vértices em {onde}", file=sys.stderr)
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        servidor.fechar()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de consultas do Recicla Fluxo.")
+    parser.add_argument("grafo", nargs="?", default=GrafosReciclaFluxo.GRAFO_FILENAME)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument("--socket", help="caminho de um socket Unix em vez de TCP")
+    parser.add_argument("--workers", type=int, help="processos para as consultas (padrão: nº de CPUs)")
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        graph = Graph.load_from_file(args.grafo)
+        if graph is None:
+            return 1
+        hierarquia = _anexar_hierarquia(graph, args.grafo)
+    graph.open_journal(args.grafo)
+    try:
+        asyncio.run(servir(graph, args.host, args.porta, args.socket, args.workers,
+                           JOURNAL_COMPACT_EVERY, hierarquia))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        graph.close_journal()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())